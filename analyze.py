@@ -2,22 +2,25 @@
 from setup import sims
 import gtensor
 from output import copy_wkr
+from registry import select
 
 # For all considered simulations
-for sim in sims:
+for sim in select(sims):
     # Copy files for safekeeping
     copy_wkr(sim)
     if sim.options.write_default:
+        # g-factors and anticrossings of all structures at once
+        summary = sim.summary()
         # wkr_new.dat
         sim.write_to_file()
         # wkr_unsorted.dat
         sim.write_to_file_unsorted_sim()
         # Minima
-        sim.write_minimum_info()
+        sim.write_minimum_info(summary)
         # Ranges
         sim.write_ranges_info()
         # g-factors
-        sim.write_gfactor_info()
+        sim.write_gfactor_info(summary)
         # piezo
         sim.write_piezo_info()
 
@@ -25,7 +28,7 @@ for sim in sims:
         # lol
         sim.write_fitting_points()
 
-for sim in gtensor.sims:
+for sim in select(gtensor.sims):
     # Data for g-tensor calculations
     if sim.options.write_gtensor:
         sim.write_gtensor()
@@ -0,0 +1,53 @@
+import numpy as np
+from os import replace, stat
+
+
+# Inode, size and modification time of a file, zeros if there is no file
+def stamp(filename):
+    try:
+        info = stat(filename)
+    except FileNotFoundError:
+        return [0, 0, 0]
+    return [info.st_ino, info.st_size, info.st_mtime_ns]
+
+
+# Save arrays together with stamps of the source files and offsets up to
+# which they were read
+def save_cache(filename,
+               arrays,  # dict of arrays to be saved
+               sources  # list of source filenames and offsets
+               ):
+    arrays = dict(arrays)
+    arrays["sources"] = np.array([stamp(source) + [offset]
+                                  for source, offset in sources],
+                                 dtype=np.uint64)
+    # Write to a temporary file first, so that readers never see half of it
+    with open(filename + ".tmp", "wb") as file:
+        np.savez(file, **arrays)
+    replace(filename + ".tmp", filename)
+
+
+# Load arrays and offsets of the source files, None if there is no cache or
+# any of the source files changed other way than by appending to it
+def load_cache(filename,
+               sources  # list of source filenames
+               ):
+    try:
+        cache = np.load(filename, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    with cache:
+        arrays = {name: cache[name] for name in cache.files}
+
+    stamps = arrays.pop("sources")
+    if len(stamps) != len(sources):
+        return None
+    for (inode, size, mtime, offset), source in zip(stamps, sources):
+        new_inode, new_size, new_mtime = stamp(source)
+        # File was replaced or truncated
+        if new_inode != inode or new_size < size:
+            return None
+        # File was modified in place
+        if new_size == size and new_mtime != mtime:
+            return None
+    return arrays, [int(offset) for offset in stamps[:, 3]]
@@ -1,42 +1,57 @@
 import numpy as np
 
 from common import mu, str_to_complex
-
-
-# Calculation class, meant to represent a single kp calculation
+from data import nev
+
+
+# Parse lines from wkr_single.dat and local.dat into records, arrays with
+# one row per calculation
+def parse_lines(lines_wkr,  # lines containing information from wkr_single.dat
+                lines_local  # lines containing information about localization
+                ):
+    n = len(lines_wkr)
+    assert n == len(lines_local), "Different number of lines to parse"
+
+    # Parse all the lines at once
+    wkr = np.fromstring("".join(lines_wkr), sep=" ")
+    local = np.fromstring("".join(lines_local), sep=" ")
+    assert not len(wkr) % n, "Lines of wkr_single differ in length"
+    assert not len(local) % n, "Lines of local differ in length"
+    wkr, local = wkr.reshape(n, -1), local.reshape(n, -1)
+
+    # Number of states calculated, should always be 4 for now
+    assert (wkr.shape[1] - 14) // 3 == nev, "Number of states is not equal 4"
+
+    # Assert to check that readout form wkr_single and local is consistant
+    numbers = wkr[:, -2:].astype(int)
+    wrong = np.flatnonzero((numbers != local[:, -2:]).any(axis=1))
+    assert not len(wrong), str(numbers[wrong[0]].tolist())
+
+    return {
+        # External electric and magnetic fields
+        "E": wkr[:, 0:3],
+        "B": wkr[:, 3:6],
+        # Energies as well as orbital and spin angular momenta
+        "energy": wkr[:, 6:6 + nev],
+        "J_z": wkr[:, 6 + nev:6 + nev * 2],
+        "S_z": wkr[:, 6 + nev * 2:6 + nev * 3],
+        # Continuous localization
+        "local": local[:, 6:6 + nev],
+        # Structure and calculation numbers
+        "n_str": numbers[:, 0],
+        "n_calc": numbers[:, 1],
+    }
+
+
+# Calculation class, meant to represent a single kp calculation, it is a view
+# of a single record of the structure data
 class Calculation():
-    def __init__(self,
-                 l_wkr,  # line containing information from wkr_single.dat
-                 l_local  # line containing information about localization
-                 ):
-        # Split input data lines for further analysis
-        l_wkr = l_wkr.split()
-        l_local = l_local.split()
-
-        # Save external electric and magnetic fields
-        self.E = [float(l_wkr[i]) for i in range(3)]
-        self.B = [float(l_wkr[i]) for i in range(3, 6)]
-
-        # Save structure and calculation numbers
-        self.n_str, self.n_calc = int(l_wkr[-2]), int(l_wkr[-1])
-
-        # Number of states calculated, should always be 4 for now
-        nev = (len(l_wkr) - 14) // 3
-        self.nev = nev
-        assert self.nev == 4, "Number of states is not equal 4"
-
-        # Save energies as well as orbital and spin angular momenta
-        self.energy = [float(l_wkr[i]) for i in range(6, 6 + nev)]
-        self.J_z = [float(l_wkr[i]) for i in range(6 + nev, 6 + nev * 2)]
-        self.S_z = [float(l_wkr[i]) for i in range(6 + nev * 2, 6 + nev * 3)]
-
-        # Continuous and discrete localization
-        self.local = [float(l_local[i]) for i in range(6, 6 + nev)]
-        self.discrete_local = [int(2 * i) for i in self.local]
-
-        # Assert to check that readout form wkr_single and local is consistant
-        assert self.n_str == int(l_local[-2]), str([self.n_str, self.n_calc])
-        assert self.n_calc == int(l_local[-1]), str([self.n_str, self.n_calc])
+    __slots__ = ["data", "id", "struct", "piezo", "spin_inplane",
+                 "g_inplane_sign"]
+
+    def __init__(self, data, id):
+        self.data = data  # Data object holding the values
+        self.id = id  # Id of the record within the data
 
         # Placeholder for additional data
         self.struct = None
@@ -48,6 +63,63 @@ class Calculation():
     def __lt__(self, other):
         return self.E_z < other.E_z
 
+    ##########################################################################
+    #                                 Record                                 #
+    ##########################################################################
+
+    @property
+    def row(self):
+        row = self.data.position[self.id]
+        assert row >= 0, "Calculation was removed from its data"
+        return row
+
+    # External electric field
+    @property
+    def E(self):
+        return self.data.E[self.row]
+
+    # External magnetic field
+    @property
+    def B(self):
+        return self.data.B[self.row]
+
+    # Energies of the states
+    @property
+    def energy(self):
+        return self.data.energy[self.row]
+
+    # Orbital angular momenta
+    @property
+    def J_z(self):
+        return self.data.J_z[self.row]
+
+    # Spin angular momenta
+    @property
+    def S_z(self):
+        return self.data.S_z[self.row]
+
+    # Continuous localization
+    @property
+    def local(self):
+        return self.data.local[self.row]
+
+    # Discrete localization
+    @property
+    def discrete_local(self):
+        return [int(2 * i) for i in self.local]
+
+    @property
+    def n_str(self):
+        return int(self.data.numbers[self.row, 0])
+
+    @property
+    def n_calc(self):
+        return int(self.data.numbers[self.row, 1])
+
+    @property
+    def nev(self):
+        return nev
+
     ##########################################################################
     #                                 Fields                                 #
     ##########################################################################
@@ -55,12 +127,12 @@ class Calculation():
     # E-field in z direction for convinience
     @property
     def E_z(self):
-        return self.E[2]
+        return float(self.data.E[self.row, 2])
 
     # B-field in z direction for convinience
     @property
     def B_z(self):
-        return self.B[2]
+        return float(self.data.B[self.row, 2])
 
     # B-field value
     @property
@@ -156,25 +228,36 @@ class Calculation():
         # In any other case do not swap
         return False
 
-    # Segregate and return energies in desired order
+    # Segregate and return values in desired order
     # After the swap the order should be: lower down and up, upper down and up
     def swap(self, old_list):
-        new_list = []
+        return [old_list[i] for i in self.order]
+
+    # Indices of the states in the swapped order, computed for the whole
+    # structure at once and cached there
+    @property
+    def order(self):
+        return self.struct.swap_orders()[self.row]
+
+    # Indices of the states in the swapped order, computed for this
+    # calculation only
+    def find_order(self):
+        order = []
         # Loop over possible localizations
         for n in [0, 1]:
             # Loop over discrete localization values
             for i, d_local in enumerate(self.discrete_local):
                 # If localizations match
                 if d_local == n:
-                    # Increase new list and check if 2 new were added
-                    new_list.append(old_list[i])
-                    if len(new_list) == 2 * (n + 1):
+                    # Increase order and check if 2 new were added
+                    order.append(i)
+                    if len(order) == 2 * (n + 1):
                         # Swap these 2 new if needed
                         if self.do_swap(i, n):
-                            new_list[2 * n], new_list[2 * n + 1] = \
-                                new_list[2 * n + 1], new_list[2 * n]
-        # Return the new list
-        return new_list
+                            order[2 * n], order[2 * n + 1] = \
+                                order[2 * n + 1], order[2 * n]
+        # Return the order
+        return order
 
     ##########################################################################
     #                         Additional information                         #
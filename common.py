@@ -1,5 +1,8 @@
 import numpy as np
+from itertools import product
+from math import floor
 from os import system, popen
+from subprocess import Popen
 
 # Constants
 mu = 5.7883818012e-5  # Bohr magneton in appropriate units
@@ -36,6 +39,19 @@ def close(x, y, eps=1e-8):
     return abs(x - y) < eps
 
 
+# Bucket of a list of values, see close_buckets
+def bucket(values, width=1e-6):
+    return tuple(floor(x / width) for x in values)
+
+
+# All buckets which may contain values close to given ones, bucket width must
+# be larger than 2 eps so that every value has at most 2 candidate buckets
+def close_buckets(values, eps=1e-8, width=1e-6):
+    candidates = [{floor((x - eps) / width), floor((x + eps) / width)}
+                  for x in values]
+    return list(product(*candidates))
+
+
 def B_direction(B):
     if B[0] == 0 and B[1] == 0:
         return "[001]"
@@ -101,12 +117,15 @@ def clear_output_file(filename):
         file.write("")
 
 
-def psi_safeguard():
-    system("python calc/psi_safeguard.py & disown")
+# Start a watchdog killing the calculation of a given pid if it takes too long
+def psi_safeguard(pid):
+    return Popen(["python", "calc/psi_safeguard.py", str(pid)])
 
 
-def psi_release():
-    system("killall python")
+# Stop the watchdog after the calculation has finished
+def psi_release(safeguard):
+    safeguard.terminate()
+    safeguard.wait()
 
 
 def str_to_complex(number):
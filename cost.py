@@ -0,0 +1,132 @@
+from os import makedirs
+from os.path import dirname, isfile
+
+import numpy as np
+
+
+# Wall time and number of iterations of kp calculations learned from the
+# finished ones. Logarithms of both are fitted linearly to the logarithms
+# of the precision and of the distance from the anticrossing, separately
+# for every structure, project, or all the calculations, whichever is the
+# most specific one with enough of them. Sums of the least squares are kept
+# for every level, so a fit does not go through all the runs. Killed runs
+# are censored, their time is only a lower bound, so they are not fitted
+# but raise the predictions of their structure at the same or a higher
+# precision above them.
+class CostModel():
+    def __init__(self, filename="runs/costs.dat",  # File keeping the runs
+                 min_runs=5,  # Number of runs needed to fit a structure
+                 seconds_per_digit=10.0,  # Seconds assumed per digit of eps
+                 censored_factor=2.0  # Prediction over the killed runs
+                 ):
+        self.filename = filename
+        self.min_runs = min_runs
+        self.seconds_per_digit = seconds_per_digit
+        self.censored_factor = censored_factor
+        self.sums = None  # Sums of the levels by key, read when needed
+        self.censored = {}  # Precision, time and iterations of killed runs
+        self.fits = {}  # Fitted coefficients by key, cleared on new runs
+        self.version = 0  # Number of runs added, predictions change with it
+
+    # Read the runs saved by the previous executions
+    def load(self):
+        if self.sums is not None:
+            return None
+        self.sums = {}
+        if not isfile(self.filename):
+            return None
+        with open(self.filename) as file:
+            for line in file:
+                words = line.split()
+                # Older files have no column marking the killed runs
+                if len(words) in [6, 7]:
+                    self.learn((words[0], int(words[1])) +
+                               tuple(float(x) for x in words[2:6]),
+                               len(words) == 7 and words[6] == "1")
+
+    # Features of a calculation, logarithms of the precision and of the
+    # distance from the anticrossing
+    @staticmethod
+    def features(eps, distance):
+        return [1.0, -np.log(eps), np.log1p(abs(distance))]
+
+    # Keys of the levels a run of the structure belongs to, most specific
+    # first
+    @staticmethod
+    def levels(projectname, n_str):
+        return [(projectname, n_str), (projectname,), ()]
+
+    # Add a run to the sums of its levels, or to the killed runs
+    def learn(self, run, killed=False):
+        projectname, n_str, eps, distance, seconds, iterations = run
+        if killed:
+            self.censored.setdefault((projectname, n_str), []).append(
+                (eps, seconds, iterations))
+            return None
+        x = np.array(self.features(eps, distance))
+        y = np.log([seconds, iterations])
+        for key in self.levels(projectname, n_str):
+            n, XX, Xy = self.sums.get(key, (0, 0.0, 0.0))
+            self.sums[key] = n + 1, XX + np.outer(x, x), Xy + np.outer(x, y)
+
+    # Remember a finished calculation, killed ones only as lower bounds
+    def add(self, projectname, n_str, eps, distance, seconds, iterations,
+            killed=False):
+        self.load()
+        run = (projectname, n_str, eps, distance, seconds, max(iterations, 1))
+        self.learn(run, killed)
+        self.fits = {}
+        self.version += 1
+        try:
+            makedirs(dirname(self.filename) or ".", exist_ok=True)
+            with open(self.filename, "a") as file:
+                file.write("\t".join(str(x) for x in run) +
+                           "\t{}\n".format(int(killed)))
+        except OSError:
+            pass
+
+    # Coefficients fitted to the runs of the structure, the project or all,
+    # None if there are no runs at all
+    def fit(self, projectname, n_str):
+        key = (projectname, n_str)
+        if key not in self.fits:
+            self.load()
+            self.fits[key] = None
+            levels = [self.sums.get(level, (0, None, None))
+                      for level in self.levels(projectname, n_str)]
+            # Most specific runs with enough of them, otherwise all the runs
+            n, XX, Xy = next((level for level in levels[:2]
+                              if level[0] >= self.min_runs), levels[2])
+            if n:
+                # Too few runs give only the average
+                if n < self.min_runs:
+                    XX, Xy = XX[:1, :1], Xy[:1]
+                self.fits[key] = np.linalg.lstsq(XX, Xy, rcond=None)[0]
+        return self.fits[key]
+
+    # Predicted wall time in seconds and number of iterations, None if
+    # there are no runs to learn from
+    def predict(self, projectname, n_str, eps, distance):
+        coefficients = self.fit(projectname, n_str)
+        # Killed runs of the structure at the same or a lower precision
+        killed = self.censored.get((projectname, n_str), [])
+        censored = [run[1:] for run in killed if run[0] >= eps]
+        if coefficients is None and not censored:
+            return None
+        predicted = np.zeros(2)
+        if coefficients is not None:
+            x = self.features(eps, distance)[:len(coefficients)]
+            predicted = np.exp(np.dot(x, coefficients))
+        for run in censored:
+            predicted = np.maximum(predicted, self.censored_factor *
+                                   np.array(run))
+        return float(predicted[0]), float(predicted[1])
+
+    # Wall time in seconds assumed before any run is learned, growing with
+    # the number of digits of the precision as the kp iterations do
+    def default_seconds(self, eps):
+        return self.seconds_per_digit * max(-np.log10(eps), 1.0)
+
+
+# Cost model shared by all the kp calculations
+costs = CostModel()
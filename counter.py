@@ -1,8 +1,7 @@
-from numpy import sum
-
 import time
 
 from common import echo
+from cost import costs
 from timer import print_time
 
 
@@ -13,6 +12,14 @@ class Counter():
         self.init_t = time.time()
         self.enable = enable
 
+        # Remaining seconds of every structure, None if not predicted, and
+        # their sum, updated when the counts or the cost model change
+        self.seconds = {}
+        self.total_seconds = 0.0
+        self.n_unknown = 0
+        self.predictions = {}  # Seconds of a calculation by key
+        self.costs_version = None
+
     @property
     def n(self):
         return sum([sim.n for sim in self.sims])
@@ -24,4 +31,45 @@ class Counter():
         echo("{}/{} done".format(x, self.init_n))
         if x <= 0 or x == self.init_n:
             return None
-        print_time(x, self.init_n, self.init_t)
+        print_time(x, self.init_n, self.init_t, self.remaining_seconds)
+
+    # Remaining time predicted by the cost model for the calculations at the
+    # anticrossings, None if nothing is learned yet
+    @property
+    def remaining_seconds(self):
+        # Every structure is affected by a change of the cost model
+        if costs.version != self.costs_version:
+            self.costs_version = costs.version
+            self.predictions = {}
+            for sim in self.sims:
+                sim.counted = set(sim.counts)
+        for sim in self.sims:
+            for struct in sim.counted:
+                n = sim.counts[struct]
+                predicted = self.predict(sim, struct.n_str) if n else (0.0,)
+                self.set_seconds(struct, None if predicted is None
+                                 else n * predicted[0])
+            sim.counted = set()
+        if self.n_unknown:
+            return None
+        return self.total_seconds / max(self.sims[0].options.n_workers, 1)
+
+    # Predicted time and iterations of a calculation at the anticrossing
+    def predict(self, sim, n_str):
+        key = (sim.projectname, n_str, sim.options.eps)
+        if key not in self.predictions:
+            self.predictions[key] = costs.predict(*key, 0.0)
+        return self.predictions[key]
+
+    # Replace the remaining seconds of a structure in the sum
+    def set_seconds(self, struct, seconds):
+        old = self.seconds.get(struct, 0.0)
+        if old is None:
+            self.n_unknown -= 1
+        else:
+            self.total_seconds -= old
+        self.seconds[struct] = seconds
+        if seconds is None:
+            self.n_unknown += 1
+        else:
+            self.total_seconds += seconds
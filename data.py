@@ -0,0 +1,142 @@
+import numpy as np
+
+# Number of states calculated, should always be 4 for now
+nev = 4
+
+# Float columns of the data together with the number of values per record
+columns = {
+    "E": 3,  # External electric field
+    "B": 3,  # External magnetic field
+    "energy": nev,  # Energies of the states
+    "J_z": nev,  # Orbital angular momenta
+    "S_z": nev,  # Spin angular momenta
+    "local": nev,  # Localizations of the states
+}
+
+
+# Struct-of-arrays storage of calculations, rows are kept sorted by E_z
+class Data():
+    def __init__(self, capacity=16):
+        self.size = 0  # Number of rows in use
+        for name, width in columns.items():
+            setattr(self, name, np.empty((capacity, width)))
+        self.numbers = np.empty((capacity, 2), dtype=int)  # n_str and n_calc
+
+        # Calculations keep their ids while rows move when sorting, so the id
+        # of every row and the row of every id (-1 if removed) are stored
+        self.ids = np.empty(capacity, dtype=int)
+        self.position = np.empty(capacity, dtype=int)
+        self.n_ids = 0
+
+    ##########################################################################
+    #                                 Records                                #
+    ##########################################################################
+
+    # Insert records given as arrays with one row per record, keeping the rows
+    # sorted by E_z, records with E_z already present replace the old rows,
+    # of repeats among the records only the last is kept. Return ids of the
+    # inserted records in their original order, ids of the replaced rows and
+    # a copy of the replaced rows in a separate data, where they are sorted
+    # by E_z as well, so their ids there are their indices
+    def insert(self, records):
+        E_z = records["E"][:, 2]
+        if not len(E_z):
+            return np.empty(0, dtype=int), np.empty(0, dtype=int), Data()
+        order = np.argsort(E_z, kind="stable")
+        order = order[np.append(E_z[order][:-1] != E_z[order][1:], True)]
+        E_z = E_z[order]
+
+        # Rows of the same E_z are found by binary search and removed
+        repeats = np.searchsorted(self.E_z, E_z)
+        found = repeats < self.size
+        found[found] = self.E_z[repeats[found]] == E_z[found]
+        repeats = repeats[found]
+        replaced = self.ids[repeats].copy()
+        detached = Data()
+        if len(repeats):
+            detached.insert(self.records(replaced))
+            keep = np.ones(self.size, dtype=bool)
+            keep[repeats] = False
+            self.remove(keep)
+
+        # Rows the records end up in, the rows after the first of them move
+        n = len(order)
+        rows = np.searchsorted(self.E_z, E_z) + np.arange(n)
+        self.reserve(self.size + n, self.n_ids + n)
+        first = rows[0]
+        moved = np.ones(self.size + n - first, dtype=bool)
+        moved[rows - first] = False
+        moved = np.flatnonzero(moved) + first
+        for name in list(columns) + ["numbers", "ids"]:
+            array = getattr(self, name)
+            array[moved] = array[first:self.size].copy()
+
+        ids = np.arange(self.n_ids, self.n_ids + n)
+        for name in columns:
+            getattr(self, name)[rows] = records[name][order]
+        self.numbers[rows, 0] = records["n_str"][order]
+        self.numbers[rows, 1] = records["n_calc"][order]
+        self.ids[rows] = ids
+        self.size += n
+        self.n_ids += n
+        self.position[self.ids[first:self.size]] = np.arange(first, self.size)
+        return ids[np.argsort(order)], replaced, detached
+
+    # Copy of the records with given ids
+    def records(self, ids):
+        rows = self.position[ids]
+        records = {name: getattr(self, name)[rows] for name in columns}
+        records["n_str"] = self.numbers[rows, 0]
+        records["n_calc"] = self.numbers[rows, 1]
+        return records
+
+    # Make sure there is space for given number of rows and ids
+    def reserve(self, size, n_ids):
+        if size > len(self.ids):
+            capacity = max(size, 2 * len(self.ids))
+            for name in list(columns) + ["numbers", "ids"]:
+                old = getattr(self, name)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+        if n_ids > len(self.position):
+            position = np.empty(max(n_ids, 2 * len(self.position)), dtype=int)
+            position[:self.n_ids] = self.position[:self.n_ids]
+            self.position = position
+
+    ##########################################################################
+    #                               Reordering                               #
+    ##########################################################################
+
+    # Remove rows not marked to be kept
+    def remove(self, keep):
+        self.position[self.ids[:self.size][~keep]] = -1
+        self.take(np.flatnonzero(keep))
+
+    # Keep only given rows, in the given order
+    def take(self, rows):
+        for name in list(columns) + ["numbers", "ids"]:
+            array = getattr(self, name)
+            array[:len(rows)] = array[rows]
+        self.size = len(rows)
+        self.position[self.ids[:self.size]] = np.arange(self.size)
+
+    ##########################################################################
+    #                                 Columns                                #
+    ##########################################################################
+
+    @property
+    def E_z(self):
+        return self.E[:self.size, 2]
+
+    @property
+    def anti(self):
+        return self.energy[:self.size, 1] - self.energy[:self.size, 0]
+
+    @property
+    def local_low(self):
+        return (self.local[:self.size, 0] + self.local[:self.size, 1]) / 2
+
+    @property
+    def local_up(self):
+        return (self.local[:self.size, 2] + self.local[:self.size, 3]) / 2
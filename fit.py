@@ -1,47 +1,4 @@
 import numpy as np
-import lmfit
-
-
-##############################################################################
-#                                  Parabola                                  #
-##############################################################################
-#
-# Fit to the parabola ax²+bx+c = 0
-# Minimum found via x₀ = -½b/a
-
-# Find parabola coefficients a, b and c given 3 points
-# Other parts of the code should ensure that this function behaves well,
-# for example there is no division by 0 or minimum is outside desired range
-def parabola(A, B, C  # 3 points taken from calculations
-             ):
-    # Assign values from the calculations using point method
-    x1, y1 = A.point
-    x2, y2 = B.point
-    x3, y3 = C.point
-
-    # Normalize values for better precision (point B should be in 0,0)
-    x1, y1 = x1 - B.point[0], y1 - B.point[1]
-    x2, y2 = x2 - B.point[0], y2 - B.point[1]
-    x3, y3 = x3 - B.point[0], y3 - B.point[1]
-
-    # Variables used to decrease number of computations
-    x1p2, x3p2, x1mx3 = x1**2, x3**2, x1 - x3
-
-    # Calculate a, b and c coefficients
-    a = (y1 / x1 - (y1 - y3) / x1mx3) / (x1p2 / x1 - (x1p2 - x3p2) / x1mx3)
-    b = (y1 - a * x1p2) / x1
-    c = y1 - a * x1p2 - b * x1
-    return a, b, c
-
-
-# Find minimum given 3 points using well know formula
-def para_min(A, B, C):
-    # Calculate coefficients a, b and c
-    a, b, c = parabola(A, B, C)
-    # Calculate minimum
-    minimum = -0.5 * b / a
-    # Compensate for changes in parabola function
-    return minimum + B.E_z
 
 
 ##############################################################################
@@ -50,32 +7,264 @@ def para_min(A, B, C):
 #
 # Fit to function √(Δ² + (A(x-x₀))²)
 # Minimum found via x₀
+# Square of the function is a parabola A²x² - 2A²x₀x + Δ² + A²x₀², so three
+# points determine the parameters exactly, fitting refines them for more
+# points or if there is no such function with x₀ between the points.
+# All functions work on many fits at once, every row of x and y is one fit.
+
+# Values of the function
+def hyperbola(x, Δ, x_0, A):
+    return np.sqrt(Δ[:, None]**2 + (A[:, None] * (x - x_0[:, None]))**2)
+
+
+# Derivatives of the function over Δ, x₀ and A, shape (fits, points, 3)
+def hyperbola_jacobian(x, Δ, x_0, A):
+    f = hyperbola(x, Δ, x_0, A)
+    d = x - x_0[:, None]
+    return np.stack((Δ[:, None] / f,
+                     -A[:, None]**2 * d / f,
+                     A[:, None] * d**2 / f), axis=-1)
+
+
+# Parameters of the function going exactly through three points, taken from
+# the parabola going through the squares, nan if there is no such function
+def hyperbola_guess(x, y):
+    x1, x2, x3 = x[:, 0], x[:, 1], x[:, 2]
+    y1, y2, y3 = y[:, 0]**2, y[:, 1]**2, y[:, 2]**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = ((y3 - y2) / (x3 - x2) - (y2 - y1) / (x2 - x1)) / (x3 - x1)
+        b = (y2 - y1) / (x2 - x1) - a * (x1 + x2)
+        c = y1 - a * x1**2 - b * x1
+        x_0 = -0.5 * b / a
+        Δ = np.sqrt(np.maximum(c - a * x_0**2, 0.0))
+        A = np.sqrt(a)
+    return Δ, x_0, A
 
-# Residue funtion used by lmfit
-def residue(params,  # parameters object provided by lmfit
-            x,  # array of x
-            y  # array of y
-            ):
-    y = np.array(y)
-    Δ = params["Δ"]  # Anticrossing parameter
-    x_0 = params["x_0"]  # Position of minimum parameter
-    A = params["A"]  # Scaling parameter due to Stark effect
-    return y - np.array([np.sqrt(Δ**2 + (A * (X - x_0))**2) for X in x])
+
+# Levenberg-Marquardt step of the parameters for many fits at once
+def damped_step(J,  # jacobians, shape (fits, points, parameters)
+                r,  # residuals, shape (fits, points)
+                damping  # damping factors, one per fit
+                ):
+    JTJ = np.einsum("fpi,fpj->fij", J, J)
+    JTr = np.einsum("fpi,fp->fi", J, r)
+    diagonal = JTJ.diagonal(axis1=1, axis2=2) + 1e-15
+    JTJ += damping[:, None, None] * np.eye(J.shape[2]) * diagonal[:, None, :]
+    with np.errstate(all="ignore"):
+        return np.linalg.solve(JTJ, JTr[..., None])[..., 0]
+
+
+# Fit the function to the points, x₀ is kept between the outermost points,
+# return Δ, x₀ and A
+def fit_hyperbola(x,  # array of x, one row per fit, at least 3 columns
+                  y,  # array of y, same shape as x
+                  max_iter=100,  # Maximal number of Levenberg-Marquardt steps
+                  tolerance=1e-10  # Relative change to stop the fitting
+                  ):
+    x, y = np.atleast_2d(np.asarray(x, dtype=float)), \
+        np.atleast_2d(np.asarray(y, dtype=float))
+    # Scale the points to values of the order of 1 for better precision
+    center = x.mean(axis=1, keepdims=True)
+    x_scale = (x.max(axis=1) - x.min(axis=1))[:, None]
+    y_scale = np.abs(y).max(axis=1, keepdims=True)
+    x_scale[x_scale == 0], y_scale[y_scale == 0] = 1.0, 1.0
+    x, y = (x - center) / x_scale, y / y_scale
+    low, high = x.min(axis=1), x.max(axis=1)
+
+    # Initial guess from the lowest point and its neighbours, otherwise
+    # minimum at the lowest point and slope from the furthest one
+    i = np.clip(np.argmin(y, axis=1), 1, x.shape[1] - 2)
+    rows = np.arange(len(x))[:, None]
+    neighbours = i[:, None] + np.arange(-1, 2)
+    params = np.column_stack(hyperbola_guess(x[rows, neighbours],
+                                             y[rows, neighbours]))
+    wrong = ~np.isfinite(params).all(axis=1) | (params[:, 1] < low) | \
+        (params[:, 1] > high)
+    if wrong.any():
+        lowest = np.argmin(y[wrong], axis=1)
+        x_0 = x[wrong][np.arange(wrong.sum()), lowest]
+        Δ = y[wrong].min(axis=1)
+        d = np.abs(x[wrong] - x_0[:, None]).max(axis=1)
+        A = np.sqrt(np.maximum((y[wrong]**2).max(axis=1) - Δ**2, 1e-12)) / d
+        params[wrong] = np.column_stack((Δ, x_0, A))
+
+    # Levenberg-Marquardt steps with the analytic jacobian, all fits at once
+    damping = np.full(len(x), 1e-3)
+    cost = ((y - hyperbola(x, *params.T))**2).sum(axis=1)
+    # Guesses going through all three points need no refinement
+    running = wrong | (x.shape[1] > 3)
+    for _ in range(max_iter):
+        if not running.any():
+            break
+        J = hyperbola_jacobian(x, *params.T)
+        r = y - hyperbola(x, *params.T)
+        step = damped_step(J, r, damping)
+        # x₀ at a bound is kept there if the step points outside
+        held = ((params[:, 1] <= low) & (step[:, 1] < 0)) | \
+            ((params[:, 1] >= high) & (step[:, 1] > 0))
+        if held.any():
+            J[held, :, 1] = 0.0
+            step[held] = damped_step(J[held], r[held], damping[held])
+        step[~np.isfinite(step).all(axis=1) | ~running] = 0.0
+        new = params + step
+        new[:, 1] = np.clip(new[:, 1], low, high)
+        step = new - params
+        new_cost = ((y - hyperbola(x, *new.T))**2).sum(axis=1)
+
+        # Accept steps which decreased the cost, damp the others more
+        better = running & (new_cost < cost)
+        small = np.abs(step).max(axis=1) <= \
+            tolerance * (np.abs(params).max(axis=1) + tolerance)
+        small |= better & (cost - new_cost <= tolerance * cost)
+        params[better], cost[better] = new[better], new_cost[better]
+        damping = np.where(better, damping / 10, damping * 10)
+        running &= ~small & (damping < 1e12) & (cost > 0)
+
+    # Scale back to the original values
+    Δ = np.abs(params[:, 0]) * y_scale[:, 0]
+    x_0 = params[:, 1] * x_scale[:, 0] + center[:, 0]
+    A = np.abs(params[:, 2]) * y_scale[:, 0] / x_scale[:, 0]
+    return Δ, x_0, A
 
 
 # Find minimum given arrays of x and y
 def fit_min(x,  # array of x
             y,  # array of y
-            # Initial guess for minimum position, necessary to ensure fitting
-            # procedure converges to correct values
-            x_0=0.0
             ):
-    # Initialize parameters object and provide initial guesses for values
-    params = lmfit.Parameters()
-    params.add("Δ", value=y[1])
-    params.add("x_0", value=x_0, min=x[0], max=x[2])
-    params.add("A", value=0.0027)
-    # Let lmfit do the fitting procedure
-    params = lmfit.minimize(residue, params=params, args=(x, y)).params
-    # Return minimum position value resulting from the fitting procedure
-    return params.valuesdict()["x_0"]
+    return float(fit_hyperbola(x, y)[1][0])
+
+
+##############################################################################
+#                           Bracketed minimization                           #
+##############################################################################
+#
+# Minimization in the style of Brent's method, the minimum of the function
+# fitted to the bracket is used only if it moves less than half of the step
+# before the last one, otherwise the larger part of the bracket is divided
+# by the golden section. Bracket shrinks at least by the golden ratio every
+# second step, so the number of steps is bounded.
+
+golden = (3.0 - np.sqrt(5.0)) / 2.0  # Golden section, ≈0.382
+
+
+# Next point given the bracket x[0] < x[1] < x[2] with the lowest y in x[1],
+# return the point, True if it comes from the fit, and the last two steps
+def bracket_step(x,  # E-field of the bracket
+                 y,  # values of the function in the bracket
+                 steps,  # last two steps, infinite at the start
+                 tol  # minimal distance between the points
+                 ):
+    left, middle, right = x
+    # Larger part of the bracket, with a sign
+    larger = left - middle if middle - left > right - middle \
+        else right - middle
+    E_min = fit_min(x, y)
+    fitted = left < E_min < right and abs(E_min - middle) < steps[1] / 2
+    if fitted:
+        step = E_min - middle
+        steps = (abs(step), steps[0])
+    else:
+        step = golden * larger
+        steps = (abs(step), abs(larger))
+    # Points closer than tol can not be distinguished, the minimum is
+    # confirmed by a point on the larger side
+    if abs(step) < tol:
+        step = tol if larger > 0 else -tol
+    # Points too close to the bracket edges are moved towards the middle
+    if not left + tol <= middle + step <= right - tol:
+        step = tol if step < 0 else -tol
+    return middle + step, fitted, steps
+
+
+# Points for several calculations run at once: the minimum of the function
+# fitted to the bracket, or points confirming it if it is in the middle,
+# and uniform grids over both parts of the bracket. The points are at least
+# tol from each other and from the bracket, if none is left a single step
+# of the serial search is taken.
+def bracket_points(x,  # E-field of the bracket
+                   y,  # values of the function in the bracket
+                   k,  # number of points
+                   tol  # minimal distance between the points
+                   ):
+    left, middle, right = x
+    E_min = fit_min(x, y)
+    if abs(E_min - middle) < tol:
+        fitted = [middle - tol, middle + tol]
+    elif left < E_min < right:
+        fitted = [E_min]
+    else:
+        fitted = []
+    fitted = fitted[:k]
+
+    # Remaining points split between the parts according to their widths
+    n = k - len(fitted)
+    n_left = int(round(n * (middle - left) / (right - left)))
+    grid = np.concatenate([
+        np.linspace(left, middle, n_left + 2)[1:-1],
+        np.linspace(middle, right, n - n_left + 2)[1:-1]])
+
+    points = []
+    for E in fitted + grid.tolist():
+        # Half of tol allows for rounding of the points confirming the middle
+        if all(abs(E - other) >= tol / 2 for other in list(x) + points):
+            points.append(E)
+    if not points:
+        points = [bracket_step(x, y, (np.inf, np.inf), tol)[0]]
+    return points
+
+
+##############################################################################
+#                                 Transition                                 #
+##############################################################################
+#
+# Fit to function ½(1 - t), t = u/√(1 + u²), u = a + bx
+# Localization of a state passing through an anticrossing of two levels,
+# with u = (x - x₀)/w, x₀ the center and w the width of the transition.
+# Transformed by u = t/√(1 - t²), t = 1 - 2y, the points lie on a line, so
+# the fit is a weighted linear regression. Weights account for the errors
+# of y growing in the transformation, which is undefined for y of 0 or 1.
+
+# Values of the function
+def transition(x, a, b):
+    u = a + b * np.asarray(x)
+    return 0.5 * (1.0 - u / np.hypot(1.0, u))
+
+
+# Fit the function to the points, return a, b and their covariance matrix,
+# None if there are less than three points within the transition
+def fit_transition(x,  # array of x
+                   y,  # array of y, between 0 and 1
+                   margin=1e-6  # Points closer to 0 or 1 are not used
+                   ):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    within = (margin < y) & (y < 1.0 - margin)
+    if within.sum() < 3:
+        return None
+    x, t = x[within], 1.0 - 2.0 * y[within]
+    u = t / np.sqrt(1.0 - t**2)
+    weights = (1.0 - t**2)**3
+
+    # Scale x to values of the order of 1 for better precision
+    center = np.average(x, weights=weights)
+    x_scale = np.abs(x - center).max() or 1.0
+    X = np.column_stack((np.ones_like(x), (x - center) / x_scale))
+    XTW = X.T * weights
+    with np.errstate(all="ignore"):
+        inverse = np.linalg.pinv(XTW @ X)
+    (a, b) = inverse @ XTW @ u
+    residuals = u - X @ (a, b)
+    variance = (weights * residuals**2).sum() / (len(x) - 2)
+    covariance = inverse * variance
+
+    # Scale back to the original values
+    scale = np.array([[1.0, -center / x_scale], [0.0, 1.0 / x_scale]])
+    return (a - b * center / x_scale, b / x_scale), \
+        scale @ covariance @ scale.T
+
+
+# Standard error of the position of the function at x, the error of its
+# value divided by the slope
+def transition_error(x, params, covariance):
+    gradient = np.array([1.0, x])
+    error = np.sqrt(max(gradient @ covariance @ gradient, 0.0))
+    return float(error / abs(params[1])) if params[1] else np.inf
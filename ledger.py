@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import sqlite3
+from os import makedirs
+from os.path import dirname
+from threading import Lock
+from time import time
+
+from common import echo
+
+
+# Columns of the ledger, one row per kp calculation launched
+columns = [
+    ("id", "INTEGER PRIMARY KEY"),
+    ("projectname", "TEXT"),
+    ("n_str", "INTEGER"),
+    ("E_x", "REAL"), ("E_y", "REAL"), ("E_z", "REAL"),
+    ("B_x", "REAL"), ("B_y", "REAL"), ("B_z", "REAL"),
+    ("eps", "REAL"),
+    ("message", "TEXT"),  # Phase of the calculation
+    ("start_time", "REAL"), ("end_time", "REAL"),  # Unix timestamps
+    ("iterations", "INTEGER"),  # Number of the last EPS line
+    ("residual", "REAL"),  # Value of the last EPS line
+    ("status", "TEXT"),  # running, done, exited, killed or failed
+    ("n_calc", "INTEGER"),  # Number of the calculation read afterwards
+]
+
+
+# Database of all the kp calculations launched, with reports of throughput,
+# failures and time spent in every phase
+class Ledger():
+    def __init__(self, filename="runs/ledger.db"):
+        self.filename = filename
+        self.connection = None  # Opened when first used
+        self.guard = Lock()  # Calculations are recorded by many workers
+
+    # Connection to the database, created together with the table if needed
+    def connect(self):
+        if self.connection is None:
+            makedirs(dirname(self.filename) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.filename,
+                                              check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS runs ({})"
+                                    .format(", ".join(" ".join(column)
+                                                      for column in columns)))
+        return self.connection
+
+    # Record a launched calculation, return its id
+    def start(self, projectname, n_str, E, B, eps, message):
+        with self.guard, self.connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (projectname, n_str, E_x, E_y, E_z, "
+                "B_x, B_y, B_z, eps, message, start_time, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'running')",
+                (projectname, n_str) + tuple(map(float, E)) +
+                tuple(map(float, B)) + (eps, message, time()))
+            return cursor.lastrowid
+
+    # Record the result of a calculation
+    def finish(self, id, status, iterations, residual, n_calc):
+        with self.guard, self.connect() as connection:
+            connection.execute(
+                "UPDATE runs SET end_time = ?, status = ?, iterations = ?, "
+                "residual = ?, n_calc = ? WHERE id = ?",
+                (time(), status, iterations, residual, n_calc, id))
+
+    ###########################################################################
+    #                                Queries                                  #
+    ###########################################################################
+
+    # Rows of a query on the finished calculations, optionally of a single
+    # project and started after a timestamp
+    def query(self, select, projectname=None, since=None, group=""):
+        conditions, values = ["end_time IS NOT NULL"], []
+        if projectname is not None:
+            conditions.append("projectname = ?")
+            values.append(projectname)
+        if since is not None:
+            conditions.append("start_time >= ?")
+            values.append(since)
+        with self.guard:
+            return self.connect().execute(
+                "SELECT {} FROM runs WHERE {} {}".format(
+                    select, " AND ".join(conditions), group),
+                values).fetchall()
+
+    # Successful calculations per hour of the time the calculations spanned
+    def throughput(self, projectname=None, since=None):
+        n, first, last = self.query(
+            "SUM(status = 'done'), MIN(start_time), MAX(end_time)",
+            projectname, since)[0]
+        if not n or last <= first:
+            return 0.0
+        return 3600.0 * n / (last - first)
+
+    # Fraction of the calculations which exited or were killed
+    def failure_rate(self, projectname=None, since=None):
+        n, failed = self.query("COUNT(*), SUM(status != 'done')",
+                               projectname, since)[0]
+        return failed / n if n else 0.0
+
+    # Number of calculations, mean and total time in seconds, and mean
+    # number of iterations of every phase, longest total first
+    def time_per_phase(self, projectname=None, since=None):
+        duration = "end_time - start_time"
+        return self.query("message, COUNT(*), AVG({0}), SUM({0}), "
+                          "AVG(iterations)".format(duration),
+                          projectname, since,
+                          "GROUP BY message ORDER BY SUM({}) DESC"
+                          .format(duration))
+
+    # Print all the reports
+    def report(self, projectname=None, since=None):
+        echo("Throughput: {:.1f} calculations per hour".format(
+            self.throughput(projectname, since)))
+        echo("Failure rate: {:.1%}".format(
+            self.failure_rate(projectname, since)))
+        for message, n, mean, total, iterations in \
+                self.time_per_phase(projectname, since):
+            echo("{}: {} calculations, {:.1f} s each, {:.1f} s in total, "
+                 "{:.0f} iterations".format(message, n, mean, total,
+                                            iterations or 0))
+
+
+# Ledger shared by all the kp calculations
+ledger = Ledger()
+
+
+# Print the reports, optionally of a single project
+if __name__ == "__main__":
+    from sys import argv
+    ledger.report(argv[1] if len(argv) > 1 else None)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from fit import fit_hyperbola, fit_transition, transition, transition_error
+
+
+# Model of a structure along E_z fitted to its calculations, localizations
+# of both states as transitions through the anticrossing and the gap as
+# a hyperbola, used to place new calculations
+class Model():
+    def __init__(self, data,  # Data of the structure
+                 rows=slice(None),  # Rows of the data the model is fitted to
+                 n_gap=7  # Number of points around the lowest gap fitted
+                 ):
+        E_z = data.E_z[rows]
+        self.points = E_z, data.local_low[rows], data.local_up[rows]
+        # Parameters and covariances of the transitions, None if not fitted
+        self.low = fit_transition(E_z, self.points[1])
+        self.up = fit_transition(E_z, self.points[2])
+
+        # Gap fitted to the lowest point and its neighbours
+        self.gap = None
+        anti = data.anti[rows]
+        if len(E_z) >= 3:
+            i = int(np.argmin(anti))
+            fitted = slice(max(i - n_gap // 2, 0), i + n_gap // 2 + 1)
+            if len(E_z[fitted]) >= 3:
+                Δ, x_0, A = fit_hyperbola(E_z[fitted], anti[fitted])
+                self.gap = float(Δ[0]), float(x_0[0]), float(A[0])
+
+    # True if both localizations are described by the model
+    @property
+    def valid(self):
+        return self.low is not None and self.up is not None
+
+    # Largest difference between the localizations of the fitted
+    # calculations and the model, inf if not fitted
+    @property
+    def deviation(self):
+        if not self.valid:
+            return np.inf
+        E_z, low, up = self.points
+        low_model, up_model = self.local(E_z)
+        return max(np.abs(low - low_model).max(), np.abs(up - up_model).max())
+
+    # Localizations of the lower and upper state predicted at E
+    def local(self, E):
+        return transition(E, *self.low[0]), transition(E, *self.up[0])
+
+    # E-field of the minimum of the gap, None if not fitted
+    @property
+    def E_min(self):
+        return None if self.gap is None else self.gap[1]
+
+    # Standard error of the position of the localizations at E, larger of
+    # both states
+    def error(self, E):
+        return max(transition_error(E, *self.low),
+                   transition_error(E, *self.up))
@@ -63,18 +63,52 @@ class Options():
         # Remove old minimas
         self.remove_old_minimas = False
 
-        # Once in how many calculations to use bisection method
-        # 1 ⟹ always
-        # large number ⟹ never
-        self.parabola_freq = 3
-        self.bisection_freq = 5
-
         self.kp_dir = "test"
 
         self.do_calcs_from_file = False
 
         self.enable_counter = True
 
+        # Keep parsed data in a binary cache next to the data files
+        self.use_cache = True
+
+        # Number of lines of the data files parsed at once
+        self.read_chunk = 100000
+
+        # Number of kp calculations run at once, 1 runs them one by one
+        self.n_workers = 1
+
+        # Calculations running for this many times their predicted time, but
+        # at least the minimal number of seconds, are stopped once without
+        # output for the minimal number of seconds
+        self.stall_margin = 5.0
+        self.min_stall_seconds = 30.0
+
+        # Record every kp calculation in the ledger database, see ledger.py
+        self.use_ledger = True
+
+        # Work on many structures of all the simulations at once, running the
+        # kp calculations of the highest priority first. Only the structures
+        # worked on at the moment compete, at most Pool.n_threads of them,
+        # the others are taken in turns from all the simulations.
+        self.prioritize = False
+
+        # Number of kp calculations run at once when looking for a minimum,
+        # 1 runs them one by one
+        self.minima_points = 1
+
+        # Place calculations at the bounds and in blank spaces using a model
+        # of localizations and the gap fitted to the calculations
+        self.use_model = False
+
+        # Number of calculations on each side of a range edge the model of
+        # the edge is fitted to
+        self.edge_points = 4
+
+        # Start structures with calculations around the range edges and the
+        # minimum extrapolated from the neighbouring structures along x_axis
+        self.predict_from_neighbours = False
+
         self.gtensor_E = gtensor_E
 
         self.restrict_unsorted = restrict_unsorted
@@ -1,7 +1,6 @@
+from math import isnan
 from os import system
 
-from common import mu
-
 int_str = "{:2d}\t"
 sci_str = "{:20.13e}\t"
 
@@ -79,7 +78,11 @@ def write_to_file_unsorted(struct, filename):
         file.write("\n\n")  # Adhere to gnuplot standard
 
 
-def write_info_minimum(struct, filename):
+def write_info_minimum(struct, filename,
+                       anti_signed,  # Signed anticrossing gap
+                       anti_gfactor,  # Gap divided by the Zeeman energy
+                       gfactor_product  # Product of the g-factors
+                       ):
     # Append to the given file
     filename = filename.format(struct.B_direction)
     with open(filename, 'a') as file:
@@ -89,15 +92,16 @@ def write_info_minimum(struct, filename):
                        sci_str.format(struct.E_y) +
                        sci_str.format(struct.x_axis) +
                        sci_str.format(struct.minimum.E_z) +
-                       sci_str.format(struct.minimum.anti_signed) +
-                       sci_str.format(struct.minimum.anti / (struct.minimum.B_value * mu)) +
+                       sci_str.format(anti_signed) +
+                       sci_str.format(anti_gfactor) +
                        sci_str.format(struct.minimum.local[0]) +
                        sci_str.format(struct.minimum.local[1]) +
                        sci_str.format(struct.minimum.S_z[0]) +
                        sci_str.format(struct.minimum.S_z[1]) +
                        sci_str.format(struct.minimum.S_z[2]) +
                        sci_str.format(struct.minimum.S_z[3]) +
-                       str(struct.gfactors_sign_diff)
+                       str(None if isnan(gfactor_product)
+                           else bool(gfactor_product < 0.0))
                        )
             new_line(file)
 
@@ -120,18 +124,18 @@ def write_info_ranges(struct, filename):
         new_line(file)
 
 
-def write_info_gfactor(struct, filename):
+def write_info_gfactor(struct, filename, g_low, g_up):
     # Append to the given file
     filename = filename.format(struct.B_direction)
-    if struct.gfactors[0] is None:
+    if isnan(g_low):
         return None
     with open(filename, 'a') as file:
         file.write(int_str.format(struct.n_str) +
                    sci_str.format(struct.E_x) +
                    sci_str.format(struct.E_y) +
                    sci_str.format(struct.x_axis) +
-                   sci_str.format(struct.gfactors[0]) +
-                   sci_str.format(struct.gfactors[1])
+                   sci_str.format(g_low) +
+                   sci_str.format(g_up)
                    )
         new_line(file)
 
@@ -176,18 +180,18 @@ def write_fitting_points(sim, filename):
                     new_line(file)
 
 
-def write_gtensor(sim, filename):
+def write_gtensor(sim, filename, summary):
     with open(filename, "w") as file:
-        for struct in sim.structures:
-            if struct.gfactors[0] is not None:
+        for i, struct in enumerate(sim.structures):
+            if not isnan(summary["g_low"][i]):
                 file.write(int_str.format(struct.n_str) +
                            sci_str.format(struct.B_x) +
                            sci_str.format(struct.B_y) +
                            sci_str.format(struct.B_z) +
                            sci_str.format(struct.phi) +
                            sci_str.format(struct.theta) +
-                           sci_str.format(struct.gfactors[0]) +
-                           sci_str.format(struct.gfactors[1])
+                           sci_str.format(summary["g_low"][i]) +
+                           sci_str.format(summary["g_up"][i])
                            )
                 if struct.coeffs is not None:
                     file.write(sci_str.format(struct.coeffs[0, 0]) +
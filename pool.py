@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heappop, heappush
+from itertools import count, zip_longest
+from threading import Event, Lock, local
+
+# Lock guarding the simulation data, a worker holds it all the time except
+# while waiting for its kp calculation to finish
+lock = Lock()
+
+# Thread-local state marking threads working for the pool
+state = local()
+
+
+# Release the lock for the duration of the block if held by a pool worker
+class released():
+    def __enter__(self):
+        self.held = getattr(state, "working", False)
+        if self.held:
+            lock.release()
+
+    def __exit__(self, *args):
+        if self.held:
+            lock.acquire()
+
+
+# Slots for kp calculations given to the waiting workers by priority
+class Scheduler():
+    def __init__(self):
+        self.free = None  # Number of free slots, None if not limited
+        self.waiting = []  # Heap of negated priorities and waiting workers
+        self.order = count()  # Workers of the same priority in order
+        self.guard = Lock()
+
+    # Limit the number of kp calculations run at once, None for no limit
+    def limit(self, n_slots):
+        with self.guard:
+            self.free = n_slots
+            self.dispatch()
+
+    # Wait for a slot, higher priorities are served first, then take up to
+    # n_slots - 1 more slots which are free. Return the number of slots
+    # taken, all of them if not limited.
+    def acquire(self, priority, n_slots=1):
+        with self.guard:
+            if self.free is None:
+                return n_slots
+            event = Event()
+            heappush(self.waiting, (-priority, next(self.order), event))
+            self.dispatch()
+        with released():
+            event.wait()
+        # Free slots are left only if no other worker is waiting
+        with self.guard:
+            if self.free is None:
+                return n_slots
+            extra = max(min(self.free, n_slots - 1), 0)
+            self.free -= extra
+        return 1 + extra
+
+    # Give the slots back after the calculations finished
+    def release(self, n_slots=1):
+        with self.guard:
+            if self.free is not None and n_slots > 0:
+                self.free += n_slots
+                self.dispatch()
+
+    # Wake up the waiting workers of the highest priority
+    def dispatch(self):
+        while self.waiting and (self.free is None or self.free > 0):
+            if self.free is not None:
+                self.free -= 1
+            heappop(self.waiting)[2].set()
+
+
+# Scheduler used by all the kp calculations
+scheduler = Scheduler()
+
+
+# Pool of workers, each running kp calculations for a single structure
+class Pool():
+    def __init__(self, sims, n_workers=1, prioritize=False,
+                 n_threads=64  # Structures worked on at once if prioritizing
+                 ):
+        self.sims = sims  # Simulations to take the structures from
+        self.n_workers = n_workers  # Number of kp calculations run at once
+        # Work on many structures at once, kp calculations are run in the
+        # order of their priority instead of the order of the structures.
+        # Only the structures worked on at the moment compete, the others
+        # are taken in turns from all the simulations as they finish.
+        self.prioritize = prioritize
+        self.n_threads = n_threads
+
+    # Structures of all the simulations
+    @property
+    def structures(self):
+        return [struct for sim in self.sims for struct in sim.structures]
+
+    # Call the method of a given name for every structure, the scheduler
+    # keeps the number of kp calculations within n_workers
+    def run(self, method, *args):
+        scheduler.limit(max(self.n_workers, 1))
+        try:
+            # Keep the old sequential behavior for a single worker
+            if self.n_workers <= 1 and not self.prioritize:
+                for struct in self.structures:
+                    getattr(struct, method)(*args)
+            else:
+                self.run_parallel(method, *args)
+        finally:
+            scheduler.limit(None)
+
+    # Call the method in many worker threads, waiting ones beyond n_workers
+    # compete for the slots by priority
+    def run_parallel(self, method, *args):
+        structures = self.structures
+        n_threads = self.n_workers
+        if self.prioritize:
+            n_threads = max(min(len(structures), self.n_threads),
+                            self.n_workers)
+            # Structures of all the simulations in turns
+            structures = [struct for structs in zip_longest(
+                *[sim.structures for sim in self.sims])
+                for struct in structs if struct is not None]
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            jobs = [executor.submit(self.work, struct, method, *args)
+                    for struct in structures]
+            # Propagate exceptions raised by the workers
+            for job in jobs:
+                job.result()
+
+    # Single job done by a worker
+    def work(self, struct, method, *args):
+        with lock:
+            state.working = True
+            try:
+                getattr(struct, method)(*args)
+            finally:
+                state.working = False
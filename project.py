@@ -0,0 +1,236 @@
+import numpy as np
+
+from cache import load_cache, save_cache
+from calculation import parse_lines
+from common import echo
+from tail import Tailer
+
+# Projects already opened, shared by all the simulations in the process
+projects = {}
+
+
+# Project of a given results directory, opened if needed
+def get_project(results_dir, options):
+    if results_dir not in projects:
+        projects[results_dir] = Project(results_dir, options)
+    return projects[results_dir]
+
+
+# Add lines of a data file to the pending ones, by the numbers of their
+# calculations, n_str and n_calc, at the end of every line
+def add_pending(pending, lines):
+    for line in lines:
+        words = line.split()
+        if len(words) >= 2:
+            pending[(int(float(words[-2])), int(float(words[-1])))] = line
+
+
+# Data files of a single kp project, read once and passed to all the
+# simulations subscribed to the project
+class Project():
+    def __init__(self, results_dir, options):
+        self.results_dir = results_dir
+        self.options = options
+        self.subscribers = []  # Simulations receiving the data
+
+        # Number of calculations read, used to avoid reading same data
+        # multiple times, starts at 0
+        self.n_calc = 0
+
+        # Readers remembering how far the files were read, and lines read
+        # from one file which are still missing their pair in the other, by
+        # the numbers of their calculations
+        self.tail_wkr = Tailer(self.wkr_filename)
+        self.tail_local = Tailer(self.local_filename)
+        self.pending_wkr, self.pending_local = {}, {}
+
+        # Readers of the files with data attached to the calculations
+        self.tails = {"additional": Tailer(self.additional_filename),
+                      "coeffs": Tailer(self.coeffs_filename)}
+
+        # Everything read from the files, records in chunks and lines
+        self.records = []
+        self.lines = {"additional": [], "coeffs": []}
+        self.cache_state = None
+
+        self.load_cache()
+
+    ###########################################################################
+    #                               Filenames                                 #
+    ###########################################################################
+
+    # Name of the local file
+    @property
+    def local_filename(self):
+        return self.results_dir + "local.dat"
+
+    # Name of the wkr_single file
+    @property
+    def wkr_filename(self):
+        return self.results_dir + "wkr_single.dat"
+
+    @property
+    def additional_filename(self):
+        return self.results_dir + "various.dat"
+
+    @property
+    def coeffs_filename(self):
+        return self.results_dir + "coeffs.dat"
+
+    # Name of the file with cached parsed data
+    @property
+    def cache_filename(self):
+        return self.results_dir + "cache.npz"
+
+    ###########################################################################
+    #                              Subscribers                                #
+    ###########################################################################
+
+    # Start passing data to the simulation, starting with everything read
+    def subscribe(self, sim):
+        self.subscribers.append(sim)
+        if self.records:
+            sim.add_to_structures(self.all_records)
+
+    def unsubscribe(self, sim):
+        self.subscribers.remove(sim)
+
+    # All records read so far
+    @property
+    def all_records(self):
+        if len(self.records) > 1:
+            self.records = [{name: np.concatenate([chunk[name]
+                                                   for chunk in self.records])
+                             for name in self.records[0]}]
+        return self.records[0]
+
+    ###########################################################################
+    #                              Data readout                               #
+    ###########################################################################
+
+    # Read new calculations and pass them to the subscribers, return the
+    # subscribers which received any and were cleaned up afterwards
+    def read_files(self):
+        lines_wkr = self.tail_wkr.read()
+        lines_local = self.tail_local.read()
+
+        # Read everything again if any of the files was truncated or replaced
+        if self.tail_wkr.rotated or self.tail_local.rotated:
+            echo("Data files changed, rereading " + self.results_dir)
+            self.reset()
+            lines_wkr = self.tail_wkr.read()
+            lines_local = self.tail_local.read()
+
+        # Pair lines of both files by the numbers of their calculations, as
+        # calculations running at once append to the files in different
+        # orders, the remaining ones wait for the next read
+        add_pending(self.pending_wkr, lines_wkr)
+        add_pending(self.pending_local, lines_local)
+        keys = [key for key in self.pending_wkr if key in self.pending_local]
+        lines_wkr = [self.pending_wkr.pop(key) for key in keys]
+        lines_local = [self.pending_local.pop(key) for key in keys]
+        n = len(keys)
+        updated = []
+        for start in range(0, n, self.options.read_chunk):
+            stop = min(start + self.options.read_chunk, n)
+            records = parse_lines(lines_wkr[start:stop],
+                                  lines_local[start:stop])
+            self.records.append(records)
+            # Add new calculations to appropriate structures
+            for sim in self.subscribers:
+                if sim.add_to_structures(records) and sim not in updated:
+                    updated.append(sim)
+
+        # Update number of read lines
+        self.n_calc += n
+
+        # Clean-up after data readout
+        for sim in updated:
+            sim.clean_up()
+        return updated
+
+    # Read new lines of a file with data attached to the calculations
+    def read_lines(self, name):
+        lines = self.tails[name].read()
+        if self.tails[name].rotated:
+            self.lines[name] = []
+            for sim in self.subscribers:
+                sim.n_attached[name] = 0
+        self.lines[name] += lines
+
+    # Forget all the data read so far
+    def reset(self):
+        self.n_calc = 0
+        self.tail_wkr.reset()
+        self.tail_local.reset()
+        self.pending_wkr, self.pending_local = {}, {}
+        for tail in self.tails.values():
+            tail.reset()
+        self.records = []
+        self.lines = {"additional": [], "coeffs": []}
+        for sim in self.subscribers:
+            sim.reset_data()
+
+    ###########################################################################
+    #                                 Cache                                   #
+    ###########################################################################
+
+    # Load data parsed before, only the rest of the files will be read
+    def load_cache(self):
+        if not self.options.use_cache:
+            return None
+        cache = load_cache(self.cache_filename, [
+            self.wkr_filename, self.local_filename,
+            self.additional_filename, self.coeffs_filename])
+        if cache is None:
+            return None
+        arrays, offsets = cache
+
+        # Continue reading the files where the cached data ends
+        for tail, offset in zip([self.tail_wkr, self.tail_local,
+                                 self.tails["additional"],
+                                 self.tails["coeffs"]], offsets):
+            tail.offset = offset
+        lines = list(self.lines) + ["pending_wkr", "pending_local"]
+        records = {name: arrays[name] for name in arrays if name not in lines}
+        self.records = [records]
+        self.n_calc = len(records["n_str"])
+        for name in self.lines:
+            self.lines[name] = [line.decode() for line in arrays[name]]
+        for name in ["pending_wkr", "pending_local"]:
+            add_pending(getattr(self, name), [line.decode() for line in
+                                              arrays.get(name, [])])
+        self.cache_state = self.read_state
+
+    # Save data parsed so far, if anything new was read
+    def save_cache(self):
+        if not self.options.use_cache or not self.records:
+            return None
+        if self.cache_state == self.read_state:
+            return None
+
+        # Lines without a pair are kept in the cache as they are not
+        # necessarily the last ones read
+        arrays = dict(self.all_records)
+        all_lines = dict(self.lines, pending_wkr=self.pending_wkr.values(),
+                         pending_local=self.pending_local.values())
+        for name, lines in all_lines.items():
+            arrays[name] = np.array([line.encode() for line in lines],
+                                    dtype=bytes)
+        try:
+            save_cache(self.cache_filename, arrays, [
+                (self.wkr_filename, self.tail_wkr.offset_before()),
+                (self.local_filename, self.tail_local.offset_before()),
+                (self.additional_filename,
+                 self.tails["additional"].offset_before()),
+                (self.coeffs_filename, self.tails["coeffs"].offset_before())])
+        except OSError:
+            echo("Could not save cache of " + self.results_dir)
+            return None
+        self.cache_state = self.read_state
+
+    # Amount of data read, used to check if the cache is up to date
+    @property
+    def read_state(self):
+        return self.n_calc, len(self.lines["additional"]), \
+            len(self.lines["coeffs"])
@@ -1,9 +1,24 @@
-from time import sleep
-from os import system
+from collections import defaultdict
+from math import inf, log
+from time import time
+from os import killpg, makedirs
+from os.path import join
+from shutil import rmtree
+from signal import SIGKILL
+from subprocess import Popen
+from tempfile import mkdtemp
 
 from common import echo, encase, screen_w, percent, psi_safeguard, psi_release
 from common import close, sqrt2
 from clear_files import clear_files
+from cost import costs
+from ledger import ledger
+from pool import released, scheduler
+from tail import Tailer, Watcher
+
+# Number of calculations of every project running at the moment, the
+# calculations of a project share its WaveFuns directory
+running = defaultdict(int)
 
 
 # Psi class, meant to prepare and execute calculation
@@ -17,6 +32,8 @@ class Psi():
                  max_seconds=180.2,
                  sleep_interval=0.1,
                  kp_log="kp_log",
+                 errlog="errlog",
+                 runs_dir="runs",
                  kp_skip=20,
                  error=0,
                  minimum=None):
@@ -29,6 +46,8 @@ class Psi():
         self.max_seconds = max_seconds
         self.sleep_interval = sleep_interval
         self.kp_log = kp_log
+        self.errlog = errlog
+        self.runs_dir = runs_dir
         self.kp_skip = kp_skip
         self.error = error
         self.minimum = minimum
@@ -36,6 +55,27 @@ class Psi():
         self.w = screen_w() - 2
         self.chars_old = "─┼░▒▓█"
         self.chars = "═╪░▒▓█"
+        self.process = None  # Process of the calculation once launched
+
+        assert self.error <= 1, "Error is too large"
+        if self.minimum and self.E_diff > 1e-3:
+            pass
+            # self.eps *= 1e3 * min(1.0, self.E_diff)
+        elif self.outer and self.E_diff > 1e-1:
+            self.eps *= 1e1 * min(1.0, self.E_diff)
+
+        # Time and iterations expected from the calculations done before,
+        # calculations running for a multiple of the time are stalled once
+        # their output stops
+        self.distance = self.struct.anticrossing_distance(self.E_z)
+        self.predicted = costs.predict(self.struct.projectname,
+                                       self.struct.n_str, self.eps,
+                                       self.distance)
+        self.stall_seconds = inf
+        if self.predicted is not None:
+            options = self.struct.options
+            self.stall_seconds = max(self.predicted[0] * options.stall_margin,
+                                     options.min_stall_seconds)
 
     def current_position(self, outer, minimum=None):
         position = self.struct.pos_in_range(self.E_z, outer, minimum)
@@ -119,65 +159,207 @@ class Psi():
 
     # Run single calculation
     def run(self):
+        self.start()
+        self.wait()
+        self.finish()
+
+    # Launch the calculation in the background, with a slot of the scheduler
+    # already reserved by the caller if given
+    def start(self, reserved=False):
+        # Wait for a free slot, the most valuable calculations go first
+        if not reserved:
+            scheduler.acquire(self.priority)
+        try:
+            self.launch()
+        except BaseException:
+            # The slot stays with the caller if the calculation could not
+            # be launched
+            if self.process is not None:
+                self.kill_psi()
+            if not reserved:
+                scheduler.release()
+            raise
+
+    # Run the calculation in a new process and record it
+    def launch(self):
         Bz_str = " -Bz {:.10f}".format(self.struct.B[2])
         Ex_str = " -Ex {:.10f}".format(self.struct.E_x)
         Ey_str = " -Ey {:.10f}".format(self.struct.E_y)
 
-        assert self.error <= 1, "Error is too large"
-        if self.minimum and self.E_diff > 1e-3:
-            pass
-            # self.eps *= 1e3 * min(1.0, self.E_diff)
-        elif self.outer and self.E_diff > 1e-1:
-            self.eps *= 1e1 * min(1.0, self.E_diff)
+        self.start_time = time()
+        self.n_iter = 0
+        self.overdue = False
 
-        # Run the calculation
-        system("python run.py psi " +
-               "--projectname " + self.struct.projectname +
-               " -Bx {:.10f}".format(self.struct.B[0]) +
-               " -By {:.10f}".format(self.struct.B[1]) +
-               Bz_str +
-               " -n {}".format(self.struct.n_str) +
-               Ex_str +
-               Ey_str +
-               " -Ez {:.10f}".format(self.E_z) +
-               " --nev_h 4 --eps " + str(self.eps) +
-               " > kp_log 2> errlog & disown")
+        # Separate directory for the logs of this calculation
+        makedirs(self.runs_dir, exist_ok=True)
+        self.run_dir = mkdtemp(prefix="{}_{}_".format(
+            self.struct.projectname, self.struct.n_str), dir=self.runs_dir)
+        self.kp_log = join(self.run_dir, self.kp_log)
+        self.errlog = join(self.run_dir, self.errlog)
+
+        # Run the calculation in its own process group
+        command = ("python run.py psi " +
+                   "--projectname " + self.struct.projectname +
+                   " -Bx {:.10f}".format(self.struct.B[0]) +
+                   " -By {:.10f}".format(self.struct.B[1]) +
+                   Bz_str +
+                   " -n {}".format(self.struct.n_str) +
+                   Ex_str +
+                   Ey_str +
+                   " -Ez {:.10f}".format(self.E_z) +
+                   " --nev_h 4 --eps " + str(self.eps))
+        with open(self.kp_log, "w") as out, open(self.errlog, "w") as err:
+            self.process = Popen(command.split(), stdout=out, stderr=err,
+                                 start_new_session=True)
+        self.status = "running"
+        self.residual = None
+        if self.struct.options.use_ledger:
+            self.ledger_id = ledger.start(
+                self.struct.projectname, self.struct.n_str,
+                (self.struct.E_x, self.struct.E_y, self.E_z), self.struct.B,
+                self.eps, self.message)
 
         self.struct.sim.read_additional()
         self.struct.sim.counter.update()
         self.calculation_info()
-        psi_safeguard()
+        self.safeguard = psi_safeguard(self.process.pid)
         self.bar(self.outer, minimum=self.minimum)
+        running[self.struct.projectname] += 1
 
-        done, last_line, time_last_line = False, "", 0
-        clear_files(self.struct.projectname)
-        while not done:
-            sleep(self.sleep_interval)
-            with open(self.kp_log) as file:
-                lines = list(file)
-                if not lines:
-                    continue
-                if lines[-1] == last_line:
-                    time_last_line += self.sleep_interval
-                else:
-                    last_line, time_last_line = lines[-1], 0
-                    if "EPS" in last_line:
-                        n_iter = int(last_line.split()[0])
+    # Wait for the calculation to finish, other workers may run meanwhile
+    def wait(self):
+        try:
+            self.watch()
+        except BaseException:
+            # The calculation runs in its own session, so interrupts do not
+            # reach it
+            self.stop()
+            raise
+        finally:
+            self.release()
+
+    # Stop the calculation without waiting for it, e.g. after an interrupt
+    def cancel(self):
+        self.stop()
+        self.release()
+
+    # Stop the calculation together with its watchdog
+    def stop(self):
+        self.kill_psi()
+        psi_release(self.safeguard)
+        self.record("failed")
+
+    # Record the result of the calculation in the ledger
+    def record(self, status, n_calc=None):
+        if self.struct.options.use_ledger:
+            ledger.finish(self.ledger_id, status, self.n_iter, self.residual,
+                          n_calc)
+
+    # Count the calculation as not running and give its slot back
+    def release(self):
+        running[self.struct.projectname] -= 1
+        scheduler.release()
+
+    # Follow the output of the calculation until it is done, exits or stalls
+    def watch(self):
+        tail = Tailer(self.kp_log)
+        watcher = Watcher(self.kp_log, self.process.pid, self.sleep_interval)
+        last_line, time_last_line = "", time()
+        with released():
+            while self.status == "running":
+                exited = self.process.poll() is not None
+                lines = tail.read(final=exited)
+                for line in lines:
+                    if "EPS" in line:
+                        n_iter = int(line.split()[0])
+                        self.n_iter = n_iter
+                        try:
+                            self.residual = float(line.split()[-1])
+                        except ValueError:
+                            pass
                         if n_iter in [1, 2, 3, 4] or not n_iter % self.kp_skip:
-                            echo('"' + last_line.rstrip("\n") + '"')
+                            echo('"' + line.rstrip("\n") + '"')
+                if lines:
+                    last_line, time_last_line = lines[-1], time()
 
-                if time_last_line >= self.max_seconds:
-                    done = True
+                if "Done" in last_line:
+                    self.status = "done"
+                    echo("Done")
+                elif exited:
+                    self.status = "exited"
+                    echo("Calculation exited without finishing!!")
+                elif time() - time_last_line >= self.max_silence:
+                    self.status = "killed"
                     self.kill_psi()
                     echo("Emergency exit!!")
+                else:
+                    timeout = self.max_silence - time() + time_last_line
+                    if not self.overdue:
+                        timeout = min(timeout, self.time_to_overdue)
+                    watcher.wait(timeout)
+            watcher.close()
+            self.process.wait()
+        self.seconds = time() - self.start_time
 
-                if "Done" in last_line:
-                    done = True
-                    echo("Done")
+    # Seconds the calculation may run without output, shorter once it runs
+    # longer than predicted, as it is stalled if its output stops then
+    @property
+    def max_silence(self):
+        if self.time_to_overdue > 0:
+            return self.max_seconds
+        if not self.overdue:
+            self.overdue = True
+            echo("Calculation exceeds its predicted time!")
+        return min(self.max_seconds, self.struct.options.min_stall_seconds)
+
+    # Seconds left until the calculation runs longer than predicted
+    @property
+    def time_to_overdue(self):
+        return self.stall_seconds - time() + self.start_time
 
-        # Read files to update the data
-        self.struct.sim.read_files()
-        psi_release()
+    # Read files to update the data
+    def finish(self):
+        status = "failed"
+        try:
+            self.struct.sim.read_files()
+            psi_release(self.safeguard)
+            # Keep the logs of failed calculations for inspection, learn the
+            # cost of the successful ones, killed ones took at least their
+            # time
+            if self.status == "done":
+                rmtree(self.run_dir, ignore_errors=True)
+            if self.status in ["done", "killed"]:
+                costs.add(self.struct.projectname, self.struct.n_str,
+                          self.eps, self.distance, self.seconds, self.n_iter,
+                          killed=self.status == "killed")
+            status = self.status
+        finally:
+            # Calculations which could not be read are failed
+            calc = None if status == "failed" else \
+                self.struct.calc_at(self.E_z)
+            self.record(status, None if calc is None else calc.n_calc)
+
+        # Remove unnecessary files once no other calculation of the project
+        # may be writing them
+        if not running[self.struct.projectname]:
+            clear_files(self.struct.projectname)
+
+    # Expected reduction of the error per unit of the cost, the error is the
+    # number of e-foldings the gap is above its target
+    @property
+    def priority(self):
+        gain = 1.0
+        if 0 < self.error < self.E_diff:
+            gain += log(self.E_diff / self.error)
+        return gain / self.cost
+
+    # Expected cost of the calculation, wall time predicted by the cost
+    # model, otherwise the time assumed from the precision
+    @property
+    def cost(self):
+        if self.predicted is not None:
+            return self.predicted[0]
+        return costs.default_seconds(self.eps)
 
     # Print information about the calculation
     def calculation_info(self):
@@ -195,6 +377,10 @@ class Psi():
              " " + percent(self.E_diff)
              + ((' ">" ' + percent(self.error)) if self.error else ""))
 
+    # Stop the calculation together with all of its subprocesses
     def kill_psi(self):
         echo("Calculation stopped!")
-        system("killall psi")
+        try:
+            killpg(self.process.pid, SIGKILL)
+        except ProcessLookupError:
+            pass
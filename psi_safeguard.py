@@ -1,8 +1,22 @@
-from os import system
-from time import sleep
+from os import system, kill, killpg
+from signal import SIGKILL
+from sys import argv
+from time import sleep, time
 
 t = 25 * 60  # 25 minutes
+pid = int(argv[1])  # Process group of the guarded calculation
+
+# Exit early if the calculation finishes by itself
+t_end = time() + t
+while time() < t_end:
+    sleep(10)
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        exit()
 
-sleep(t)
 system("touch works")
-system("killall psi")
+try:
+    killpg(pid, SIGKILL)
+except ProcessLookupError:
+    pass
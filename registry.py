@@ -0,0 +1,50 @@
+from argparse import ArgumentParser
+
+from simulation import Simulation
+
+
+# Simulation constructed, and its data read, only when first used
+class LazySimulation():
+    def __init__(self, options, **kwargs):
+        object.__setattr__(self, "options", options)
+        object.__setattr__(self, "kwargs", kwargs)  # Simulation arguments
+        object.__setattr__(self, "sim", None)
+
+    # Available without constructing the simulation, used for filtering
+    @property
+    def projectname(self):
+        return self.kwargs.get("projectname", "QD")
+
+    @property
+    def output_filename(self):
+        return "data/" + self.kwargs.get("output_filename", "wkr_new.dat")
+
+    # Construct the simulation if not yet done
+    def load(self):
+        if self.sim is None:
+            object.__setattr__(self, "sim",
+                               Simulation(self.options, **self.kwargs))
+        return self.sim
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+
+# Simulations matching filters given in the command line arguments,
+# --project takes project names, --output parts of output filenames
+def select(sims, args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--project", nargs="+", default=None)
+    parser.add_argument("--output", nargs="+", default=None)
+    filters, _ = parser.parse_known_args(args)
+
+    if filters.project is not None:
+        sims = [sim for sim in sims if sim.projectname in filters.project]
+    if filters.output is not None:
+        sims = [sim for sim in sims
+                if any(output in sim.output_filename
+                       for output in filters.output)]
+    return sims
@@ -4,28 +4,32 @@ from common import make_psi, echo
 from counter import Counter
 from clear_files import clear_files
 from options import Options
+from pool import Pool
+from registry import select
 from setup import sims
 
 # File maintainance
 make_psi()  # Compile newest psi version
 clear_files()  # Clear unnecessary files
 
+# Only simulations chosen in the command line
+sims = select(sims)
+
 counter = Counter(sims, Options().enable_counter)
+pool = Pool(sims, Options().n_workers, Options().prioritize)
 
 # Generate required minimum
 for sim in sims:
     sim.counter = counter
 
 # Generate required minimum
-for sim in sims:
-    sim.counter = counter
-    sim.gen_required()
-    sim.gen_required()
+pool.run("gen_required")
+pool.run("gen_required")
 
 # Keep generating data given time
 counter.enable = False
 while Options().continue_calculations:
+    pool.run("continue_generating")
     for sim in sims:
-        sim.continue_generating()
         sim.options.increase_threshold()
     echo("Increasing threshold of calculations")
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3.6
 
 from os import system
+from sys import argv
 
 from common import make_psi, echo
 from counter import Counter
+from pool import Pool
 from clear_files import clear_files
 from options import Options
+from registry import select
 from setup import sims
 
 # File maintainance
@@ -13,18 +16,21 @@ system("cp psi_piezo.F08 psi.F08")
 make_psi()  # Compile newest psi version
 clear_files()  # Clear unnecessary files
 
+# Only simulations chosen in the command line
+sims = select(sims)
+
 counter = Counter(sims, Options().enable_counter)
+pool = Pool(sims, Options().n_workers, Options().prioritize)
 
 # Generate required minimum
 for sim in sims:
     sim.counter = counter
 
 # Generate additional data if requested
-for sim in sims:
-    sim.gen_various()
+pool.run("gen_various")
 
 echo("Additional information generated for all structures")
 
 system("cp psi_proper.F08 psi.F08")
 make_psi()  # Compile newest psi version
-system("calc/run.py")
+system(" ".join(["calc/run.py"] + argv[1:]))
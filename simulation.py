@@ -1,10 +1,14 @@
 from itertools import product
+from os.path import isfile
 
-from calculation import Calculation
-from common import clear_output_file, B_direction, echo
+import numpy as np
+
+from common import clear_output_file, B_direction, echo, bucket, \
+    close_buckets, mu
 from output import write_to_file, write_to_file_unsorted, write_info_minimum, \
     write_info_ranges, write_info_gfactor, write_info_piezo, \
     write_fitting_points, write_gtensor
+from project import get_project
 from psi import Psi
 from structure import Structure
 
@@ -39,18 +43,33 @@ class Simulation():
 
         # Assign structures list
         self.structures = self.generate_structures
-
-        # Number of calculations read, used to avoid reading same data
-        # multiple times, starts at 0
-        self.n_calc = 0
-
-        # Read data from the files
+        self.index_structures()
+
+        # Remaining work of every structure and in total, structures which
+        # changed since the last count are counted again
+        self.counts = {}
+        self.n_total = 0
+        self.n_thresholds = None
+        self.recount = set(self.structures)
+        self.counted = set()  # Structures counted again since last asked
+
+        # Calculations by (n_str, n_calc), lines of the attached data for
+        # calculations not read yet wait in the pending dicts
+        self.calc_index = {}
+        self.pending_additional, self.pending_coeffs = {}, {}
+        # Number of lines of attached data already processed
+        self.n_attached = {"additional": 0, "coeffs": 0}
+
+        # Read data from the files, shared with other simulations
+        self.project = get_project(self.results_dir, self.options)
+        self.project.subscribe(self)
         self.read_files()
         if self.options.read_special_cases and read_special:
             self.read_special_cases()
         self.read_additional()
         if "gtensor" in self.output_filename:
             self.read_coeffs()
+        self.project.save_cache()
 
     # Generate structures for given parameter lists
     @property
@@ -80,6 +99,31 @@ class Simulation():
                 struct.next3 = structs_reverse[i - 3]
         return structures
 
+    # Index of the structures by buckets of their fields, used to quickly
+    # find the structure a calculation belongs to
+    def index_structures(self):
+        self.structure_index = {}
+        for i, struct in enumerate(self.structures):
+            key = (struct.n_str,) + bucket(struct.E_xy) + bucket(struct.B)
+            self.structure_index.setdefault(key, []).append((i, struct))
+        # Structures already found for exact fields read from the files
+        self.structure_cache = {}
+
+    # Number of the structure a calculation of given numbers and fields
+    # belongs to, -1 if there is none
+    def structure_number(self, n_str, E, B):
+        fields = tuple(E[:2]) + tuple(B)
+        key = (n_str,) + fields
+        if key not in self.structure_cache:
+            # Take the first matching structure, as a linear search would
+            candidates = [i
+                          for buckets in close_buckets(fields)
+                          for i, struct in self.structure_index.get(
+                              (n_str,) + buckets, [])
+                          if struct.calc_belongs(n_str, E, B)]
+            self.structure_cache[key] = min(candidates, default=-1)
+        return self.structure_cache[key]
+
     ###########################################################################
     #                              Data readout                               #
     ###########################################################################
@@ -96,77 +140,67 @@ class Simulation():
 
         return result + self.projectname + "/WaveFuns/"
 
-    # Name of the local file
-    @property
-    def local_filename(self):
-        return self.results_dir + "local.dat"
-
-    # Name of the wkr_single file
-    @property
-    def wkr_filename(self):
-        return self.results_dir + "wkr_single.dat"
-
-    @property
-    def additional_filename(self):
-        return self.results_dir + "various.dat"
-
-    @property
-    def coeffs_filename(self):
-        return self.results_dir + "coeffs.dat"
-
     # Read data from the files
     def read_files(self):
-        i = 0  # Current line index
-        # Open input files
-        with open(self.wkr_filename) as file_wkr:
-            with open(self.local_filename) as file_local:
-                # Loop over input files lines
-                for line_wkr, line_local in zip(file_wkr, file_local):
-                    i += 1
-                    # Update only if there is new data
-                    if i > self.n_calc:
-                        # Add new calculation to appropriate structure
-                        calc = Calculation(line_wkr, line_local)
-                        self.add_to_structures(calc)
-
-                # Update number of read lines
-                self.n_calc = i
+        updated = self.project.read_files()
 
         # Do a single calculation is no files to read from
-        if i == 0:
+        if self.project.n_calc == 0:
             Psi(self.structures[0]).run()
 
-        # Clean-up after data readout
-        self.clean_up()
+        # Clean-up after data readout, unless already done by the project
+        if self not in updated:
+            self.clean_up()
+
+    # Forget all the data read so far
+    def reset_data(self):
+        self.calc_index = {}
+        self.pending_additional, self.pending_coeffs = {}, {}
+        self.n_attached = {"additional": 0, "coeffs": 0}
+        for struct in self.structures:
+            struct.clear()
+            struct.additional = None
 
     def read_additional(self):
-        try:
-            with open(self.additional_filename) as file:
-                for line in file:
-                    n_calc = int(line.split()[-1])
-                    n_str = int(line.split()[-2])
-                    for struct in self.structures:
-                        for calc in struct.calcs:
-                            if calc.n_calc == n_calc and calc.n_str == n_str:
-                                calc.add_additional(line)
-                                struct.additional = calc
-        except FileNotFoundError:
+        if not isfile(self.project.additional_filename):
             echo("There is no file with additional data in "
                  + self.projectname)
+            return None
+        self.read_attached("additional", self.pending_additional,
+                           self.attach_additional)
 
     def read_coeffs(self):
-        try:
-            with open(self.coeffs_filename) as file:
-                for line in file:
-                    n_calc = int(line.split()[-1])
-                    n_str = int(line.split()[-2])
-                    for struct in self.structures:
-                        for calc in struct.calcs:
-                            if calc.n_calc == n_calc and calc.n_str == n_str:
-                                calc.add_coeffs(line)
-        except FileNotFoundError:
+        if not isfile(self.project.coeffs_filename):
             echo("There is no file with coefficients in "
                  + self.projectname)
+            return None
+        self.read_attached("coeffs", self.pending_coeffs, self.attach_coeffs)
+
+    # Attach new lines of a file to the calculations with matching numbers
+    def read_attached(self, name, pending, attach):
+        self.project.read_lines(name)
+        lines = self.project.lines[name]
+        for line in lines[self.n_attached[name]:]:
+            key = (int(line.split()[-2]), int(line.split()[-1]))
+            if key in self.calc_index:
+                attach(self.calc_index[key], line)
+            else:
+                pending[key] = line
+        self.n_attached[name] = len(lines)
+
+    def attach_additional(self, calc, line):
+        calc.add_additional(line)
+        calc.struct.additional = calc
+        self.recount.add(calc.struct)
+
+    def attach_coeffs(self, calc, line):
+        calc.add_coeffs(line)
+
+    # Remove calculation from the index, e.g. when it is a repeat
+    def unindex(self, calc):
+        key = (calc.n_str, calc.n_calc)
+        if self.calc_index.get(key) is calc:
+            del self.calc_index[key]
 
     # Read special cases of the same structures in different projects
     def read_special_cases(self):
@@ -195,17 +229,41 @@ class Simulation():
                                              read_special=False)
                             # Copy the data to the structure object
                             for calc in sim.structures[0].calcs:
-                                struct.calcs.append(calc)
+                                struct.add(calc)
+                            sim.project.unsubscribe(sim)
         # Clean up after the reading
         self.clean_up()
 
-    # Add new calculation to appropriate structure
-    def add_to_structures(self, calc):
-        for struct in self.structures:
-            if struct.calc_belongs(calc):
-                struct.calcs.append(calc)
-                calc.struct = struct
-                break  # Break as the structure has been found
+    # Add new calculations, given as arrays of records, to appropriate
+    # structures, return number of calculations added
+    def add_to_structures(self, records):
+        # Find structure for every distinct set of numbers and fields
+        fields = np.column_stack((records["n_str"], records["E"][:, :2],
+                                  records["B"]))
+        fields, inverse = np.unique(fields, axis=0, return_inverse=True)
+        structs = np.array([self.structure_number(int(f[0]), f[1:3], f[3:])
+                            for f in fields])[inverse.reshape(-1)]
+
+        # Pass records to the structures, keeping their order
+        order = np.argsort(structs, kind="stable")
+        splits = np.flatnonzero(np.diff(structs[order])) + 1
+        for rows in np.split(order, splits):
+            if structs[rows[0]] < 0:
+                continue
+            struct = self.structures[structs[rows[0]]]
+            self.index(struct.extend({name: values[rows]
+                                      for name, values in records.items()}))
+        return int(np.sum(structs >= 0))
+
+    # Index new calculations and attach the data which came before them
+    def index(self, calcs):
+        for calc in calcs:
+            key = (calc.n_str, calc.n_calc)
+            self.calc_index[key] = calc
+            if key in self.pending_additional:
+                self.attach_additional(calc, self.pending_additional.pop(key))
+            if key in self.pending_coeffs:
+                self.attach_coeffs(calc, self.pending_coeffs.pop(key))
 
     ##########################################################################
     #                            Data generation                             #
@@ -234,41 +292,12 @@ class Simulation():
     # Generate required minimum
     def gen_required(self):
         for struct in self.structures:
-            struct.calc_based_on_previous()
-            struct.calc_bounds(outer=True)
-            struct.calc_bounds(outer=False)
-            if not struct.has_minimum:
-                struct.fill_blanks(outer=False)
-            struct.gen_minimas()
-            struct.calc_right()
-            if self.options.fill_blanks_limit < 0.5:
-                struct.fill_blanks(outer=False)
-                struct.fill_blanks_near_anticrossing()
-                struct.fill_blanks_near_anticrossing()
-                struct.fill_blanks_near_anticrossing()
-                struct.fill_blanks_near_anticrossing()
-                struct.fill_blanks_near_anticrossing()
-                # struct.fill_blanks(outer=True)
+            struct.gen_required()
 
     # Generate additional data
     def continue_generating(self):
         for struct in self.structures:
-            struct.calc_based_on_previous()
-            # Increase limits to make sure they are met
-            struct.limits[0] -= 1
-            struct.limits[1] += 1
-            # Look for minimas in the entire range
-            struct.gen_minimas(outer=False)
-            # Do calculations for the inner range
-            struct.calc_bounds(outer=False, left=False)
-            struct.calc_bounds(outer=False, right=False)
-            struct.fill_blanks(outer=False)
-            # Do calculations for the outer range
-            struct.calc_bounds(outer=True, left=False)
-            struct.calc_bounds(outer=True, right=False)
-            struct.fill_blanks(outer=True)
-            # Look for minimas in the entire range again
-            struct.gen_minimas(outer=False)
+            struct.continue_generating()
 
     ###########################################################################
     #                                Clean up                                 #
@@ -276,16 +305,8 @@ class Simulation():
 
     # One method to do all clean up procedures
     def clean_up(self):
-        self.sort_structures()  # Sorting data
-        self.remove_repeats()  # Removing repeated entries
-        self.update_limits()  # Updating limits
-        self.update_ranges()  # Updating ranges
-        self.update_minimum()  # Updating ranges
-
-    # Sort structures by the Ez of their calculations
-    def sort_structures(self):
         for struct in self.structures:
-            struct.sort_per_Ez()
+            struct.update()  # Only structures which received new data
 
     # Update limits
     def update_limits(self):
@@ -297,11 +318,6 @@ class Simulation():
         for struct in self.structures:
             struct.update_ranges()
 
-    # Remove repeated entries
-    def remove_repeats(self):
-        for struct in self.structures:
-            struct.remove_repeats()
-
     # Update minimum information
     def update_minimum(self):
         for struct in self.structures:
@@ -311,6 +327,45 @@ class Simulation():
     #                            Output and infos                             #
     ###########################################################################
 
+    # Properties of all the structures at once, arrays in the order of the
+    # structures with nan where not available: g-factors of the dots,
+    # anticrossing gap, signed gap, gap divided by the Zeeman energy and E_z
+    # of the minimum
+    def summary(self):
+        n = len(self.structures)
+        summary = {name: np.full(n, np.nan) for name in [
+            "g_low", "g_up", "anti", "anti_signed", "anti_gfactor", "E_min"]}
+
+        # g-factors from the energies of the additional calculations
+        additional = [(i, struct.additional.energies_in_localization_order,
+                       struct.additional.B)
+                      for i, struct in enumerate(self.structures)
+                      if struct.additional is not None]
+        additional = [calc for calc in additional if len(calc[1]) == 4]
+        if additional:
+            rows, energies, B = (np.array(i) for i in zip(*additional))
+            B_value = np.linalg.norm(B, axis=1)
+            summary["g_low"][rows] = \
+                (energies[:, 1] - energies[:, 0]) / mu / B_value
+            summary["g_up"][rows] = \
+                (energies[:, 3] - energies[:, 2]) / mu / B_value
+
+        # Anticrossing at the minimum
+        minima = [(i, struct.minimum.energy, struct.minimum.S_z,
+                   struct.minimum.B, struct.minimum.E_z)
+                  for i, struct in enumerate(self.structures)
+                  if struct.minimum is not None]
+        if minima:
+            rows, energy, S_z, B, E_z = (np.array(i) for i in zip(*minima))
+            anti = energy[:, 1] - energy[:, 0]
+            summary["anti"][rows] = anti
+            summary["anti_signed"][rows] = \
+                anti * np.sign(S_z[:, 0] - S_z[:, 1] + 1e-5)
+            summary["anti_gfactor"][rows] = \
+                anti / (np.linalg.norm(B, axis=1) * mu)
+            summary["E_min"][rows] = E_z
+        return summary
+
     # Write data to the file
     def write_to_file(self, filename=""):
         # If not provided use default filename
@@ -343,11 +398,15 @@ class Simulation():
             return [B_direction(B) for B in self.B_list]
 
     # Write info about the minimum to the output file
-    def write_minimum_info(self):
+    def write_minimum_info(self, summary=None):
+        summary = self.summary() if summary is None else summary
         for B in self.B_string_list:
             clear_output_file(self.minimum_filename.format(B))
-        for struct in self.structures:
-            write_info_minimum(struct, self.minimum_filename)
+        for i, struct in enumerate(self.structures):
+            write_info_minimum(struct, self.minimum_filename,
+                               summary["anti_signed"][i],
+                               summary["anti_gfactor"][i],
+                               summary["g_low"][i] * summary["g_up"][i])
 
     # Write info about the minimum to the output file
     def write_ranges_info(self):
@@ -357,11 +416,13 @@ class Simulation():
             write_info_ranges(struct, self.ranges_filename)
 
     # Write info about the minimum to the output file
-    def write_gfactor_info(self):
+    def write_gfactor_info(self, summary=None):
+        summary = self.summary() if summary is None else summary
         for B in self.B_string_list:
             clear_output_file(self.gfactor_filename.format(B))
-        for struct in self.structures:
-            write_info_gfactor(struct, self.gfactor_filename)
+        for i, struct in enumerate(self.structures):
+            write_info_gfactor(struct, self.gfactor_filename,
+                               summary["g_low"][i], summary["g_up"][i])
 
     # Write info about the minimum to the output file
     def write_piezo_info(self):
@@ -374,9 +435,23 @@ class Simulation():
     def write_fitting_points(self):
         write_fitting_points(self, self.B_fit_filename)
 
-    def write_gtensor(self):
-        write_gtensor(self, self.B_gtensor_filename)
+    def write_gtensor(self, summary=None):
+        summary = self.summary() if summary is None else summary
+        write_gtensor(self, self.B_gtensor_filename, summary)
 
     @property
     def n(self):
-        return sum([struct.n for struct in self.structures])
+        # Every structure is affected by a change of thresholds
+        thresholds = (self.options.bound_limit, self.options.right_limit,
+                      self.options.minima_eps)
+        if thresholds != self.n_thresholds:
+            self.n_thresholds = thresholds
+            self.recount = set(self.structures)
+        for struct in self.recount:
+            n = struct.n
+            self.n_total += n - self.counts.get(struct, 0)
+            if n != self.counts.get(struct):
+                self.counted.add(struct)
+            self.counts[struct] = n
+        self.recount = set()
+        return self.n_total
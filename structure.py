@@ -1,11 +1,16 @@
-from numpy import log2, ceil, sqrt, arccos, arctan2
+import numpy as np
+from numpy import log, log2, ceil, sqrt, arccos, arctan2, inf
 from numpy.linalg import norm
 
 from itertools import product
 
 from common import close, encase, percent, ϕ
-from common import echo, B_direction, inplane_vector_from_angle
-from fit import para_min, fit_min
+from common import B_direction, inplane_vector_from_angle
+from calculation import Calculation
+from data import Data
+from fit import bracket_points, bracket_step, golden
+from model import Model
+from pool import scheduler
 from psi import Psi
 
 
@@ -21,7 +26,8 @@ class Structure():
         self.E_xy = E_xy  # In-plane E-field list
         self.E_x = E_xy[0]  # E-field in x direction
         self.E_y = E_xy[1]  # E-field in y direction
-        self.calcs = []  # Calculations list
+        self.data = Data()  # Values of the calculations
+        self.calcs = []  # Calculations list, views of the data
         self.B = B  if "Brotate" not in self.sim.output_filename else inplane_vector_from_angle(self.angle) # Magnetic field tuple
         self.B_val = norm(B)  # Magnetic field tuple
         self.B_x = self.B[0]  # B-field in x direction
@@ -35,6 +41,10 @@ class Structure():
         self.minimum = None
         self.E_min_diff = None
         self.minimum_index = None
+        self.changed = True  # Properties need to be updated after new data
+        # Values derived from the calculations, limits and ranges, cleared
+        # whenever any of them changes
+        self.cache = {}
 
         # Previous structure in the list, may or may not be overwritten
         self.previous = None
@@ -56,14 +66,18 @@ class Structure():
             return self.outer_range if outer else self.inner_range
 
     def minimum_range(self, minimum):
+        return self.cached(("minimum_range", minimum),
+                           lambda: self.find_minimum_range(minimum))
+
+    def find_minimum_range(self, minimum):
         left_border = minimum - self.options.minima_vicinity / 2.0
         right_border = minimum + self.options.minima_vicinity / 2.0
-        left_list = [E for E in self.E_z_list if E <= left_border]
-        right_list = [E for E in self.E_z_list if E >= right_border]
-        if left_list and right_list:
-            left = max(left_list)
-            right = min(right_list)
-            return (left, right)
+        # Closest values outside of the borders, found in the sorted array
+        E_z = self.E_z_array
+        left = np.searchsorted(E_z, left_border, side="right") - 1
+        right = np.searchsorted(E_z, right_border, side="left")
+        if left >= 0 and right < len(E_z):
+            return (float(E_z[left]), float(E_z[right]))
         return None
 
     # Check if given E-field value is in range
@@ -111,6 +125,10 @@ class Structure():
 
     # Gap in Ez in percents, either maximum or at the bounds
     def gap(self, outer, maximum=False):
+        return self.cached(("gap", outer, maximum),
+                           lambda: self.find_gap(outer, maximum))
+
+    def find_gap(self, outer, maximum=False):
         E_list = self.E_list_in_range(outer)
         # If E_list empty return 100%
         if len(E_list) <= 1:
@@ -125,6 +143,9 @@ class Structure():
 
     @property
     def right(self):
+        return self.cached("right", self.find_right)
+
+    def find_right(self):
         span = self.outer_range[1] - self.inner_range[1] if self.options.gfactor_to_right else self.inner_range[0] - self.outer_range[0]
         if not span:
             return 1.0, 1.0
@@ -138,13 +159,103 @@ class Structure():
             E_left = self.E_diff_list_in_range(True)[0]
         return E_left / span, E_right / span
 
-    # E-field for calculations at the bounds
-    def bound_E(self, i, outer, error=0):
+    # E-field for calculations at the bounds, placed by the model if it is
+    # used and predicts the edge of the range within the gap, target is the
+    # gap to be reached as a fraction of the current one
+    def bound_E(self, i, outer, error=0, target=None):
         E_lists = self.E_diff_list_in_threshold(outer)
+        E, E_diff = E_lists[0] if i == 0 else E_lists[-1]
+        if self.options.use_model and target is not None:
+            E_model = self.model_E(E, E_diff, outer, i == 0, target)
+            if E_model is not None:
+                return E_model
         if i == 0:
-            return E_lists[0][0] + ϕ(error) * E_lists[0][1]
+            return E + ϕ(error) * E_diff
         elif i == 1:
-            return E_lists[-1][0] + (1 - ϕ(error)) * E_lists[-1][1]
+            return E + (1 - ϕ(error)) * E_diff
+
+    # Edge of the range within the gap predicted by the model of the
+    # calculations around it, moved by a third of the target gap if the
+    # model is certain enough, so that two calculations pass the edge. None
+    # if the model is poor or the edge is not in the gap.
+    def model_E(self, E, E_diff, outer, left, target):
+        c = self.model_edge(E, E_diff, outer, left)
+        if c is None:
+            return None
+
+        shift = target * E_diff / 3
+        if self.edge_model(E + E_diff / 2).error(c) < shift:
+            # Larger part of the gap is cut off first
+            larger = c - E if c - E > E + E_diff - c else c - E - E_diff
+            c -= np.sign(larger) * min(shift, abs(larger) / 2)
+        # Points too close to the calculations are moved into the gap
+        margin = 1e-3 * E_diff
+        return min(max(c, E + margin), E + E_diff - margin)
+
+    # Edge of the range within the gap predicted by the model of the
+    # calculations around it, None if the model is poor or the edge is not
+    # in the gap
+    def model_edge(self, E, E_diff, outer, left):
+        model = self.edge_model(E + E_diff / 2)
+        if model is None:
+            return None
+        low_lim_l, up_lim_l, low_lim_r, up_lim_r = self.range_limits(outer)
+
+        # True outside of the range on the side of the edge
+        def beyond(E_z):
+            low, up = model.local(E_z)
+            if left:
+                return (low > low_lim_l) and (up > up_lim_l)
+            return (low < low_lim_r) and (up < up_lim_r)
+
+        a, b = E, E + E_diff
+        if beyond(a) != left or beyond(b) == left:
+            return None
+        # Edge found by bisection of the model
+        for _ in range(50):
+            c = (a + b) / 2
+            if beyond(c) == left:
+                a = c
+            else:
+                b = c
+        return (a + b) / 2
+
+    # Edge of the range, predicted by the model if it is used, otherwise the
+    # middle of the gap at the edge
+    def edge(self, outer, left):
+        E_l, E_r = self.E_boundary(outer, left)
+        E = None
+        if self.options.use_model:
+            E = self.model_edge(E_l, E_r - E_l, outer, left)
+        return (E_l + E_r) / 2 if E is None else E
+
+    # Points filling a blank space moved towards the minimum predicted by
+    # the model, the spaces between them stay below the threshold
+    def model_points(self, points, E, E_diff, threshold):
+        E_min = self.model.E_min
+        if E_min is None or not E < E_min < E + E_diff:
+            return points
+        slack = (threshold - E_diff / (len(points) + 1)) / 2
+        j = np.argmin(np.abs(points - E_min))
+        points[j] += np.clip(E_min - points[j], -slack, slack)
+        return points
+
+    # Model of the calculations along E_z
+    @property
+    def model(self):
+        return self.cached("model", lambda: Model(self.data))
+
+    # Model fitted only to the calculations closest to E on both sides, None
+    # if it does not describe them within a half of the localization limit
+    def edge_model(self, E):
+        def compute():
+            n = self.options.edge_points
+            i = int(np.searchsorted(self.data.E_z, E))
+            model = Model(self.data, slice(max(i - n, 0), i + n))
+            if model.deviation > self.options.limit / 2:
+                return None
+            return model
+        return self.cached(("edge_model", E), compute)
 
     # Precision of bounds calculation
     def bound_E_percent(self, i, outer):
@@ -165,36 +276,102 @@ class Structure():
         else:
             return [E_list[-2], E_list[-1]]
 
-    # List of all E-field values
+    # Array of all E-field values
     @property
-    def E_z_list(self):
-        result = [calc.E_z for calc in self.calcs]
+    def E_z_array(self):
+        return self.cached("E_z_array", self.find_E_z_array)
 
-        if result == []:
-            result = [self.limits[0]] + result + [self.limits[1]]
+    def find_E_z_array(self):
+        result = self.data.E_z
+
+        if not len(result):
+            result = np.array(self.limits)
         else:
             if self.limits[0] < result[0]:
-                result = [self.limits[0]] + result
+                result = np.concatenate(([self.limits[0]], result))
             if self.limits[1] > result[-1]:
-                result = result + [self.limits[1]]
+                result = np.concatenate((result, [self.limits[1]]))
 
         return result
 
+    # List of all E-field values
+    @property
+    def E_z_list(self):
+        return self.cached("E_z_list", self.E_z_array.tolist)
+
+    # E-field array within a given range
+    def E_array_in_range(self, outer):
+        def compute():
+            E_range = self.E_range(outer)
+            E_z = self.E_z_array
+            return E_z[(E_range[0] <= E_z) & (E_z <= E_range[1])]
+        return self.cached(("E_array_in_range", outer), compute)
+
     # E-field list within a given range
     def E_list_in_range(self, outer):
-        E_range = self.E_range(outer)
-        return [i for i in self.E_z_list if E_range[0] <= i <= E_range[1]]
+        return self.cached(("E_list_in_range", outer),
+                           self.E_array_in_range(outer).tolist)
 
     # E-field differences list within a given range
     def E_diff_list_in_range(self, outer):
-        E_list = self.E_list_in_range(outer)
-        return [E_list[i] - E_list[i - 1] for i in range(1, len(E_list))]
+        return self.cached(("E_diff_list_in_range", outer), lambda:
+                           np.diff(self.E_array_in_range(outer)).tolist())
 
     # E-field and their differences list within given range and threshold
     def E_diff_list_in_threshold(self, outer, threshold=0.0):
-        E_list = self.E_list_in_range(outer)
-        E_diff_list = self.E_diff_list_in_range(outer)
-        return [(i, j) for i, j in zip(E_list, E_diff_list) if j >= threshold]
+        def compute():
+            E_list = self.E_list_in_range(outer)
+            E_diff_list = self.E_diff_list_in_range(outer)
+            return [(i, j) for i, j in zip(E_list, E_diff_list)
+                    if j >= threshold]
+        return self.cached(("E_diff_list_in_threshold", outer, threshold),
+                           compute)
+
+    # Value computed once until the calculations, limits or ranges change
+    def cached(self, key, compute):
+        if key not in self.cache:
+            self.cache[key] = compute()
+        return self.cache[key]
+
+    # Order of the states of every calculation after swapping, depends on the
+    # signs of the in-plane g-factors of the additional calculation
+    def swap_orders(self):
+        signs = None if self.additional is None else \
+            tuple(self.additional.g_inplane_sign)
+        return self.cached(("swap_orders", signs),
+                           lambda: self.find_swap_orders(signs))
+
+    def find_swap_orders(self, signs):
+        size = self.data.size
+        discrete_local = (2 * self.data.local[:size]).astype(int)
+        # Lower pair first, then upper pair, both in the original order
+        orders = np.argsort(discrete_local, axis=1, kind="stable")
+
+        # Out-of-plane magnetic field, swap if spin is the other way around
+        swap = np.zeros((size, 2), dtype=bool)
+        in_z = self.data.B[:size, 2] == 1.0
+        S_z = np.take_along_axis(self.data.S_z[:size], orders[:, 1::2], axis=1)
+        swap[in_z] = S_z[in_z] < 0
+        # In-plane magnetic field, swap if g-factor sign is negative
+        if signs is not None:
+            swap[~in_z] = np.array(signs) < 0
+        for n in [0, 1]:
+            rows = np.flatnonzero(swap[:, n])
+            orders[rows, 2 * n], orders[rows, 2 * n + 1] = \
+                orders[rows, 2 * n + 1], orders[rows, 2 * n]
+        orders = orders.tolist()
+
+        # Calculations without two states in each dot are ordered one by one
+        normal = ((discrete_local == 0).sum(axis=1) == 2) & \
+            ((discrete_local == 1).sum(axis=1) == 2)
+        for row in np.flatnonzero(~normal):
+            orders[row] = self.calcs[row].find_order()
+        return orders
+
+    # Forget cached values, remaining work has to be counted again
+    def invalidate(self):
+        self.cache = {}
+        self.sim.recount.add(self)
 
     ###########################################################################
     #                              Calculations                               #
@@ -209,10 +386,13 @@ class Structure():
         for E, E_diff in self.E_diff_list_in_threshold(outer, threshold):
             # Number of points to fill the blank space
             n = int(E_diff / threshold)
+            points = E + E_diff * np.arange(1, n + 1) / (n + 1)
+            if self.options.use_model:
+                points = self.model_points(points, E, E_diff, threshold)
             # Do calculations n times
-            for j in range(n):
+            for E_z in points:
                 Psi(self, outer=outer,
-                    E_z=E + E_diff * (j + 1) / (n + 1),
+                    E_z=E_z,
                     eps_factor=self.eps_factor(outer),
                     message="Filling blanks in " + self.title(outer),
                     E_diff=E_diff / self.span(outer) / n,
@@ -229,10 +409,13 @@ class Structure():
                 continue
             # Number of points to fill the blank space
             n = int(E_diff / threshold)
+            points = E + E_diff * np.arange(1, n + 1) / (n + 1)
+            if self.options.use_model:
+                points = self.model_points(points, E, E_diff, threshold)
             # Do calculations n times
-            for j in range(n):
+            for E_z in points:
                 Psi(self, outer=False,
-                    E_z=E + E_diff * (j + 1) / (n + 1),
+                    E_z=E_z,
                     eps_factor=self.eps_factor(False),
                     message="Filling blanks in " + self.title(False),
                     E_diff=E_diff / self.span(False) / n,
@@ -262,7 +445,7 @@ class Structure():
                 error = self.options.bound_limit / bounds_factor
                 E_diff = bounds[i % 2]
                 Psi(self, outer=outer,
-                    E_z=self.bound_E(i % 2, outer, E_diff),
+                    E_z=self.bound_E(i % 2, outer, E_diff, error / E_diff),
                     eps_factor=self.eps_factor(outer),
                     E_diff=E_diff,
                     message="Generating " + self.title(outer) + " " + side,
@@ -290,7 +473,7 @@ class Structure():
                 error = self.options.right_limit / bounds_factor_right
                 E_diff = bounds[1]
                 Psi(self, outer=True,
-                    E_z=self.bound_E(1 if self.options.gfactor_to_right else 0, self.options.gfactor_to_right, E_diff),
+                    E_z=self.bound_E(1 if self.options.gfactor_to_right else 0, self.options.gfactor_to_right, E_diff, error / E_diff),
                     eps_factor=self.eps_factor(self.options.gfactor_to_right),
                     E_diff=E_diff,
                     message=message,
@@ -304,7 +487,7 @@ class Structure():
                 error = self.options.right_limit / bounds_factor_left
                 E_diff = bounds[0]
                 Psi(self, outer=True,
-                    E_z=self.bound_E(1 if self.options.gfactor_to_right else 0, not self.options.gfactor_to_right, E_diff),
+                    E_z=self.bound_E(1 if self.options.gfactor_to_right else 0, not self.options.gfactor_to_right, E_diff, error / E_diff),
                     eps_factor=self.eps_factor(not self.options.gfactor_to_right),
                     E_diff=E_diff,
                     message=message,
@@ -312,6 +495,8 @@ class Structure():
                     ).run()
 
     def calc_based_on_previous(self):
+        if self.options.predict_from_neighbours:
+            self.calc_predicted()
         for outer, left in product([True, False], [False, True]):
             message = "Generating {} based on previous".format(
                 'outer' if outer else 'inner')
@@ -361,6 +546,99 @@ class Structure():
                         error=self.options.minima_eps / self.span(outer)
                         ).run()
 
+    # Calculations bracketing the range edges and the minimum predicted from
+    # the neighbouring structures
+    def calc_predicted(self):
+        for outer in [True, False]:
+            edges = [self.predict_edge(outer, left) for left in [True, False]]
+            # Points are a quarter of the allowed gap from the edges, relative
+            # to the span between the predicted edges if both are known
+            span = self.span(outer)
+            if None not in edges and edges[0] < edges[1]:
+                span = edges[1] - edges[0]
+            shift = self.options.bound_limit * span / 4
+            for i, left in [(1, False), (0, True)]:
+                if edges[i] is not None:
+                    self.calc_around_edge(outer, left, edges[i], shift)
+
+        # The minimum is found if it is within a sixth of eps from the middle
+        E = self.predict_minimum()
+        if E is None:
+            return None
+        eps = self.options.minima_eps
+        for E_z in [E, E - eps / 3, E + eps / 3]:
+            if self.has_minimum and self.E_min_diff < eps:
+                break
+            if self.in_range_exclusive(E_z, outer=False):
+                Psi(self, False,
+                    E_z=E_z,
+                    E_diff=eps / self.span(False),
+                    message="Generating minima predicted from neighbours",
+                    eps_factor=self.options.eps_factor_for_minima,
+                    minimum=E,
+                    error=eps / self.span(False)
+                    ).run()
+
+    # Calculations on both sides of a predicted edge of the range
+    def calc_around_edge(self, outer, left, E, shift):
+        i = 0 if left else 1
+        for E_z in [E - shift, E + shift]:
+            bounds = self.gap(outer)
+            bounds_factor = self.bounds_factor(outer, i)
+            if bounds[i] < self.options.bound_limit / bounds_factor:
+                break
+            E_l, E_r = self.E_boundary(outer=outer, left=left)
+            if E_l < E_z < E_r:
+                Psi(self, outer,
+                    E_z=E_z,
+                    message="Generating {} predicted from neighbours"
+                    .format(self.title(outer)),
+                    E_diff=bounds[i],
+                    eps_factor=self.eps_factor(outer),
+                    error=self.options.bound_limit / bounds_factor
+                    ).run()
+
+    # Neighbouring structures, closest first
+    @property
+    def neighbours(self):
+        return [struct for struct in [self.previous, self.next,
+                                      self.previous2, self.next2,
+                                      self.previous3, self.next3]
+                if struct is not None]
+
+    # Edge of the range extrapolated from the neighbours with the edge found
+    # within the bounds limit, edges at the limits are not found yet
+    def predict_edge(self, outer, left):
+        i = 0 if left else 1
+        return self.predict([(struct, struct.edge(outer, left))
+                             for struct in self.neighbours
+                             if struct.gap(outer)[i] < self.options.bound_limit
+                             and struct.E_range(outer)[i] != struct.limits[i]])
+
+    # Minimum extrapolated from the neighbours with the minimum found
+    def predict_minimum(self):
+        return self.predict([(struct, struct.E_min)
+                             for struct in self.neighbours
+                             if struct.has_minimum and
+                             struct.E_min_diff < self.options.minima_eps])
+
+    # Value of the structure from the values of the structures given with
+    # them, fitted by a polynomial of x_axis of at most the second order.
+    # None if there are less than two structures or x_axis is not defined
+    # for the structures or does not tell them apart.
+    def predict(self, values):
+        if len(values) < 2 or not self.has_x_axis:
+            return None
+        x = [struct.x_axis for struct, _ in values] + [self.x_axis]
+        if any(x_i is None or not np.isfinite(x_i) for x_i in x):
+            return None
+        x, x_self = x[:-1], x[-1]
+        if len(set(x)) < len(x):
+            return None
+        y = [value for _, value in values]
+        coefficients = np.polyfit(x, y, min(len(x) - 1, 2))
+        return float(np.polyval(coefficients, x_self))
+
     def bounds_factor(self, outer, i):
         bounds = self.gap(outer)
         if bounds[0] != 1:
@@ -376,6 +654,45 @@ class Structure():
         else:
             return 1.0, 1.0
 
+    # Generate required minimum
+    def gen_required(self):
+        self.calc_based_on_previous()
+        self.calc_bounds(outer=True)
+        self.calc_bounds(outer=False)
+        if not self.has_minimum:
+            self.fill_blanks(outer=False)
+        self.gen_minimas()
+        self.calc_right()
+        if self.options.fill_blanks_limit < 0.5:
+            self.fill_blanks(outer=False)
+            self.fill_blanks_near_anticrossing()
+            self.fill_blanks_near_anticrossing()
+            self.fill_blanks_near_anticrossing()
+            self.fill_blanks_near_anticrossing()
+            self.fill_blanks_near_anticrossing()
+            # self.fill_blanks(outer=True)
+
+    # Generate additional data
+    def continue_generating(self):
+        self.calc_based_on_previous()
+        # Increase limits to make sure they are met
+        self.limits[0] -= 1
+        self.limits[1] += 1
+        self.changed = True  # Ranges depend on the limits
+        self.invalidate()
+        # Look for minimas in the entire range
+        self.gen_minimas(outer=False)
+        # Do calculations for the inner range
+        self.calc_bounds(outer=False, left=False)
+        self.calc_bounds(outer=False, right=False)
+        self.fill_blanks(outer=False)
+        # Do calculations for the outer range
+        self.calc_bounds(outer=True, left=False)
+        self.calc_bounds(outer=True, right=False)
+        self.fill_blanks(outer=True)
+        # Look for minimas in the entire range again
+        self.gen_minimas(outer=False)
+
     ###########################################################################
     #                           Minima calculations                           #
     ###########################################################################
@@ -407,100 +724,97 @@ class Structure():
             eps_factor=1e0
             ).run()
 
-    # Find and generate points for minimas
+    # Find and generate points for minimas, bracketed minimization on the
+    # calculations around the minimum, see fit.bracket_step
     def gen_minimas(self, outer=False):
         if self.minimum is None:
             return None
-        # Initialize counter variables
-        do_bisection = 0
-
-        while True:
-            i = self.minimum_index
-            if self.E_min_diff < self.options.minima_eps:
+        if self.options.minima_points > 1:
+            return self.gen_minimas_parallel(outer)
+        eps = self.options.minima_eps
+        steps = (inf, inf)
+        # Bracket shrinks at least by the golden ratio every second step
+        n_max = 2 * max(int(ceil(log(self.E_min_diff / eps) /
+                                 log(1 / (1 - golden)))), 0) + 4
+
+        for _ in range(n_max):
+            if self.minimum is None or self.E_min_diff < eps:
                 return None
-            do_bisection += 1
-            # Decide which method to use
-            if not do_bisection % self.options.bisection_freq:
-                self.bisection_minimum(i, outer)
-            elif do_bisection % self.options.parabola_freq:
-                self.fitting_minimum(i, outer)
-            else:
-                self.parabola_minimum(i, outer)
-
-    # Look for a minimum using bisection method
-    def bisection_minimum(self, i, outer):
-        E_list = self.E_list_minimum(i)
-        # Calculate to the left
-        error = self.options.minima_eps / self.span(outer)
-        E_diff = self.E_min_diff / self.span(outer)
-        if self.calcs[i - 1].anti > self.calcs[i + 1].anti:
-            E_z = E_list[1] - (E_list[1] - E_list[0]) * (1 - ϕ(E_diff))
-        # Calculate to the right
-        else:
-            E_z = E_list[1] + (E_list[2] - E_list[1]) * (1 - ϕ(E_diff))
-        # Run the calculation
-        Psi(self, outer,
-            E_z=E_z*0.98+(E_list[2] + E_list[0])/2*0.02,
-            E_diff=E_diff,
-            message="Generating minima by bisection",
-            eps_factor=self.options.eps_factor_for_minima,
-            minimum=None if outer else E_list[1],
-            error=error
-            ).run()
-
-    # Look for a minimum using parabola method
-    def parabola_minimum(self, i, outer):
-        E_list = self.E_list_minimum(i)
-        # Find E-field for a suspected minimum
-        E_min = para_min(self.calcs[i - 1], self.calcs[i], self.calcs[i + 1])
-        # Exit if parabola calculations are not precise enough
-        if not E_list[0] < E_min < E_list[2]:
-            echo("Fitting by fitting v2 skipped! " +
-                 "{} not in range {}-{}".format(E_min, E_list[0], E_list[2]))
-        # Calculate point for the suspected minimum if not already calculated
-        if not close(E_min, E_list[1]):
+            i = self.minimum_index
+            E_list = self.E_list_minimum(i)
+            anti = [self.calcs[i + x].anti for x in [-1, 0, 1]]
+            E_z, fitted, steps = bracket_step(E_list, anti, steps, eps / 4)
             Psi(self, outer,
-                E_z=E_min*0.98+(E_list[2] + E_list[0])/2*0.02,
+                E_z=E_z,
                 E_diff=self.E_min_diff / self.span(outer),
-                message="Generating minima by parabolas",
+                message="Generating minima by " +
+                ("fitting" if fitted else "golden section"),
                 eps_factor=self.options.eps_factor_for_minima,
                 minimum=None if outer else E_list[1],
-                error=self.options.minima_eps / self.span(outer)
+                error=eps / self.span(outer)
                 ).run()
-        # Calculate two points nearby to get proper range
-        else:
-            for sign in [-1, 1]:
-                if self.E_min_diff < self.options.minima_eps:
-                    return None
-                side = "left" if sign == -1 else "right"
-                Psi(self, outer,
-                    E_z=E_min + sign * self.options.minima_eps / 20,
-                    E_diff=self.E_min_diff / self.span(outer),
-                    message="Minima confirmed, " + side + " vicinity",
-                    eps_factor=self.options.eps_factor_for_minima,
-                    minimum=None if outer else E_list[1],
-                    error=self.options.minima_eps / self.span(outer)
-                    ).run()
 
-    def fitting_minimum(self, i, outer):
-        E_list = self.E_list_minimum(i)
-        # Find E-field for a suspected minimum
-        x = [c.E_z for c in self.calcs if c.E_z in E_list]
-        y = [c.anti for c in self.calcs if c.E_z in E_list]
-        E_min = fit_min(x, y, x_0=x[1])
-        # Exit if parabola calculations are not precise enough
-        if not E_list[0] < E_min < E_list[2]:
-            echo("Fitting by fitting v2 skipped! " +
-                 "{} not in range {}-{}".format(E_min, E_list[0], E_list[2]))
-        # Calculate point for the suspected minimum if not already calculated
-        elif not close(E_min, E_list[1]):
-            Psi(self, outer,
-                E_z=E_min*0.98+(E_list[2] + E_list[0])/2*0.02,
-                E_diff=self.E_min_diff / self.span(outer),
-                message="Generating minima by fitting",
-                eps_factor=self.options.eps_factor_for_minima,
-                minimum=None if outer else E_list[1],
-                error=self.options.minima_eps / self.span(outer)).run()
+    # Find and generate points for minimas running several calculations at
+    # once, as many as there are free slots of the scheduler, at most
+    # minima_points. Rounds with several points shrink the bracket around
+    # the minimum by at least a half of their number, see
+    # fit.bracket_points, rounds with a single one take a step of the
+    # serial search.
+    def gen_minimas_parallel(self, outer=False):
+        eps = self.options.minima_eps
+        steps = (inf, inf)
+        n_max = 2 * max(int(ceil(log(self.E_min_diff / eps) /
+                                 log(1 / (1 - golden)))), 0) + 4
+
+        for _ in range(n_max):
+            if self.minimum is None or self.E_min_diff < eps:
+                return None
+            i = self.minimum_index
+            E_list = self.E_list_minimum(i)
+            anti = [self.calcs[i + x].anti for x in [-1, 0, 1]]
+
+            # Slots for the points, at least one
+            n_slots = scheduler.acquire(
+                self.minima_psi(outer, E_list[1], E_list[1], 1).priority,
+                self.options.minima_points)
+            if n_slots > 1:
+                steps = (inf, inf)
+                points = bracket_points(E_list, anti, n_slots, eps / 4)
+            else:
+                E_z, _, steps = bracket_step(E_list, anti, steps, eps / 4)
+                points = [E_z]
+            psis = [self.minima_psi(outer, E_z, E_list[1], len(points))
+                    for E_z in points]
+
+            # Start all the calculations before waiting for any of them,
+            # slots not taken by a started calculation are given back
+            started = []
+            try:
+                for psi in psis:
+                    psi.start(reserved=True)
+                    started.append(psi)
+            finally:
+                scheduler.release(n_slots - len(started))
+                for i, psi in enumerate(started):
+                    try:
+                        psi.wait()
+                    except BaseException:
+                        for other in started[i + 1:]:
+                            other.cancel()
+                        raise
+                for psi in started:
+                    psi.finish()
+
+    # Calculation of a minimum run together with others
+    def minima_psi(self, outer, E_z, E_middle, n_points):
+        eps = self.options.minima_eps
+        return Psi(self, outer,
+                   E_z=E_z,
+                   E_diff=self.E_min_diff / self.span(outer),
+                   message="Generating minima, {} at once".format(n_points),
+                   eps_factor=self.options.eps_factor_for_minima,
+                   minimum=None if outer else E_middle,
+                   error=eps / self.span(outer))
 
     ##########################################################################
     #                              Minima misc.                              #
@@ -528,6 +842,15 @@ class Structure():
     #                            Update properties                            #
     ###########################################################################
 
+    # Update all the properties, if there is new data
+    def update(self):
+        if self.changed:
+            self.update_limits()
+            self.update_ranges()
+            self.update_minimum()
+            self.changed = False
+            self.invalidate()
+
     # Update limits
     def update_limits(self):
         # Update if calculations list is not empty, otherwise do nothing
@@ -544,34 +867,40 @@ class Structure():
         self.update_range(outer=True)
         self.update_range(outer=False)
 
-    # Update either outer or inner range
-    def update_range(self, outer=True):
-        # Set to the default range
-        range = self.limits[:]
-
-        # Define values for definitions
+    # Localization limits of the lower and upper state defining the range,
+    # on the left and on the right side
+    def range_limits(self, outer=True):
         limit = self.options.limit
         low_lim_l = ((1 - limit) if outer else (1 - limit))
         up_lim_l = limit if outer else 0.0
         low_lim_r = limit
         up_lim_r = (1.0 - limit) if outer else 1.0
+        return low_lim_l, up_lim_l, low_lim_r, up_lim_r
+
+    # Update either outer or inner range
+    def update_range(self, outer=True):
+        # Set to the default range
+        range = self.limits[:]
+
+        low_lim_l, up_lim_l, low_lim_r, up_lim_r = self.range_limits(outer)
 
         # Compare every calculation to define ranges
-        left_range_found = False
-        for calc in self.calcs:
-            # Left side range
-            if calc.local_low > low_lim_l and calc.local_up > up_lim_l:
-                if not left_range_found:
-                    range[0] = calc.E_z
-            else:
-                left_range_found = True
-            # Right side range
-            if calc.local_low < low_lim_r:
-                if calc.local_up < up_lim_r:
-                    if range[1] == self.limits[1]:
-                        range[1] = calc.E_z
-                        # Exit as range is already found
-                        break
+        E_z = self.data.E_z
+        local_low, local_up = self.data.local_low, self.data.local_up
+        # Right side range, first calculation below the limits
+        right = np.flatnonzero((local_low < low_lim_r) & (local_up < up_lim_r))
+        if len(right):
+            range[1] = E_z[right[0]]
+        # Left side range, last calculation above the limits before the
+        # first one below them, no further than the right side range
+        last = right[0] if len(right) else len(E_z) - 1
+        left = (local_low[:last + 1] > low_lim_l) & \
+            (local_up[:last + 1] > up_lim_l)
+        first_below = np.flatnonzero(~left)
+        first_below = first_below[0] if len(first_below) else last + 1
+        if first_below > 0:
+            range[0] = E_z[first_below - 1]
+        range = [float(i) for i in range]
         # Assign newly found range
         if outer:
             self.outer_range = tuple(range)
@@ -582,20 +911,38 @@ class Structure():
     def E_min(self):
         return self.minimum.E_z
 
+    # Calculation at the E-field, None if there is none
+    def calc_at(self, E):
+        i = int(np.searchsorted(self.data.E_z, E))
+        for j in [i - 1, i]:
+            if 0 <= j < len(self.calcs) and close(self.calcs[j].E_z, E):
+                return self.calcs[j]
+        return None
+
+    # Distance of the E-field from the anticrossing, from the middle of the
+    # inner range if the minimum is not found yet
+    def anticrossing_distance(self, E):
+        center = self.E_min if self.has_minimum else sum(self.inner_range) / 2
+        return abs(E - center)
+
     def update_minimum(self):
         self.minimum = None
         self.minimum_index = None
         self.E_min_diff = None
-        for i, calc in enumerate(self.calcs[1:-1]):
-            if self.in_range_exclusive(calc.E_z, False):
-                if calc.anti > self.calcs[i].anti:
-                    continue
-                if calc.anti > self.calcs[i + 2].anti:
-                    continue
-                if self.minimum is None or calc.anti < self.minimum.anti:
-                    self.minimum = calc
-                    self.E_min_diff = self.calcs[i + 2].E_z - self.calcs[i].E_z
-                    self.minimum_index = i + 1
+        E_z, anti = self.data.E_z, self.data.anti
+        if len(E_z) < 3:
+            return None
+        # Local minima within the inner range, excluding the edges
+        inner = self.inner_range
+        candidates = np.flatnonzero((inner[0] < E_z[1:-1]) &
+                                    (E_z[1:-1] < inner[1]) &
+                                    (anti[1:-1] <= anti[:-2]) &
+                                    (anti[1:-1] <= anti[2:])) + 1
+        if len(candidates):
+            i = candidates[np.argmin(anti[candidates])]
+            self.minimum = self.calcs[i]
+            self.E_min_diff = float(E_z[i + 1] - E_z[i - 1])
+            self.minimum_index = int(i)
 
     ###########################################################################
     #                            Output and infos                             #
@@ -626,38 +973,55 @@ class Structure():
     def eps_factor(self, outer):
         return self.options.eps_factor_for_outer if outer else 1
 
-    # Sort calculations, if there are any
-    def sort_per_Ez(self):
-        if self.calcs:
-            self.calcs.sort()
-
-    # Check if calculation belongs to the structure
-    def calc_belongs(self, calc):
+    # Add records given as arrays keeping calculations sorted by E_z, return
+    # the new calculations. Repeated E_z replaces the old calculation.
+    def extend(self, records):
+        ids, replaced, detached = self.data.insert(records)
+        if len(replaced):
+            # Replaced calculations keep their values in the detached data,
+            # as they may still be referenced, e.g. as the additional one
+            replaced = {id: j for j, id in enumerate(replaced.tolist())}
+            for calc in self.calcs:
+                if calc.id in replaced:
+                    calc.data, calc.id = detached, replaced[calc.id]
+                    self.sim.unindex(calc)
+            self.calcs = [calc for calc in self.calcs
+                          if calc.data is self.data]
+        new = [Calculation(self.data, int(id)) for id in ids]
+        for calc in sorted(new, key=lambda calc: calc.row):
+            calc.struct = self
+            self.calcs.insert(calc.row, calc)
+        self.changed = True
+        self.invalidate()
+        return new
+
+    # Add a copy of a calculation, possibly from another structure
+    def add(self, calc):
+        new, = self.extend(calc.data.records([calc.id]))
+        new.piezo = calc.piezo
+        new.spin_inplane = calc.spin_inplane
+        new.g_inplane_sign = calc.g_inplane_sign
+        return new
+
+    # Remove all the calculations
+    def clear(self):
+        self.data = Data()
+        self.calcs = []
+        self.changed = True
+        self.invalidate()
+
+    # Check if calculation of given numbers and fields belongs to the structure
+    def calc_belongs(self, n_str, E, B):
         # Structure number is correct
-        if self.n_str == calc.n_str:
+        if self.n_str == n_str:
             # In-plane electric field is correct
-            if close(self.E_x, calc.E[0]) and close(self.E_y, calc.E[1]):
+            if close(self.E_x, E[0]) and close(self.E_y, E[1]):
                 # Magnetic field is correct
-                if (close(self.B[0], calc.B[0]) and close(self.B[1], calc.B[1])
-                        and close(self.B[2], calc.B[2])):
+                if (close(self.B[0], B[0]) and close(self.B[1], B[1])
+                        and close(self.B[2], B[2])):
                     return True
         return False
 
-    # Deleted repeated records
-    def remove_repeats(self):
-        i = 0  # Counter variable
-        # Go over all pairs of neighbors
-        while i < len(self.calcs) - 1:
-            # If E_z is the same remove record due to unnecessary repeat
-            # This increases counter by decreasing list length
-            if self.calcs[i].E_z == self.calcs[i + 1].E_z:
-                # if self.projectname == "E_field":
-                #     echo(self.projectname+"\t" +str(self.calcs[i].n_str) + "\t" + str(self.calcs[i].n_calc))
-                self.calcs.pop(i)
-            # Else increase counter
-            else:
-                i += 1
-
     @property
     def gfactors(self):
         if self.additional is not None:
@@ -695,8 +1059,16 @@ class Structure():
         else:
             return arctan2(self.B_y, self.B_x)
 
+    # Estimated number of calculations still needed, depends on the
+    # thresholds set in the options as well
     @property
     def n(self):
+        options = self.options
+        return self.cached(("n", self.additional is None, options.bound_limit,
+                            options.right_limit, options.minima_eps),
+                           self.find_n)
+
+    def find_n(self):
         n = 1 if self.additional is None else 0
         # if "gtensor" in self.sim.output_filename:
         #     return 1 if self.additional is None else 0
@@ -717,6 +1089,18 @@ class Structure():
             n += min(max(int(ceil(log2(x)/3)), 0), 5)
         return n
 
+    # True if x_axis is defined for the project of the structure, it may
+    # still be None for some of the structures
+    @property
+    def has_x_axis(self):
+        output_filename = self.sim.output_filename
+        return (self.projectname == "E_field" or
+                any(name in output_filename for name in
+                    ["B_field_gfactor", "anticrossing_gfactor"]) or
+                any(name in self.projectname for name in
+                    ["rotate", "shift", "diffc", "diffH", "topvar",
+                     "downvar", "diffD", "diffR", "elong"]))
+
     @property
     def x_axis(self):
         if "B_field_gfactor" in self.sim.output_filename:
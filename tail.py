@@ -0,0 +1,113 @@
+import ctypes
+import ctypes.util
+from os import O_NONBLOCK, close, read, stat
+from select import select
+from time import sleep
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+
+
+# Incremental reader of a growing file, remembers where it stopped reading
+class Tailer():
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0  # Number of bytes already read
+        self.buffer = b""  # Incomplete last line
+        self.inode = None  # Inode of the file, changes if file is replaced
+        self.rotated = False  # True if the file was truncated or replaced
+
+    # Start reading from the beginning of the file
+    def reset(self):
+        self.offset = 0
+        self.buffer = b""
+
+    # Offset of the end of the last complete line, or of the first of given
+    # lines read before
+    def offset_before(self, lines=[]):
+        return self.offset - len(self.buffer) - \
+            sum(len(line.encode()) for line in lines)
+
+    # Return lines appended since the last call, final flushes incomplete line
+    def read(self, final=False):
+        # Check if the file was truncated or replaced since the last call
+        self.rotated = False
+        try:
+            info = stat(self.filename)
+        except FileNotFoundError:
+            info = None
+        if info is not None:
+            if self.inode is not None and (info.st_ino != self.inode or
+                                           info.st_size < self.offset):
+                self.rotated = True
+                self.reset()
+            self.inode = info.st_ino
+
+        try:
+            with open(self.filename, "rb") as file:
+                file.seek(self.offset)
+                data = file.read()
+        except FileNotFoundError:
+            data = b""
+        self.offset += len(data)
+
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        if final and self.buffer:
+            lines.append(self.buffer)
+            self.buffer = b""
+        return [line.decode() + "\n" for line in lines]
+
+
+# File descriptor notified about modifications of a file, None if unavailable
+def inotify_fd(filename):
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_CLOSE_WRITE
+    if libc.inotify_add_watch(fd, filename.encode(), mask) < 0:
+        close(fd)
+        return None
+    return fd
+
+
+# File descriptor becoming readable when a process exits, None if unavailable
+def pid_fd(pid):
+    try:
+        from os import pidfd_open
+        return pidfd_open(pid)
+    except (ImportError, OSError):
+        return None
+
+
+# Sleep until a file is modified, the process exits or timeout passes
+class Watcher():
+    def __init__(self, filename, pid, sleep_interval=0.1):
+        self.sleep_interval = sleep_interval  # Used if nothing can be watched
+        self.inotify = inotify_fd(filename)
+        self.fds = [fd for fd in [self.inotify, pid_fd(pid)] if fd is not None]
+
+    def wait(self, timeout):
+        timeout = max(timeout, 0.0)
+        # Fall back to polling
+        if not self.fds:
+            sleep(min(timeout, self.sleep_interval))
+            return None
+        ready, _, _ = select(self.fds, [], [], timeout)
+        # Drain inotify events so that the next wait blocks again
+        if self.inotify in ready:
+            try:
+                while read(self.inotify, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        for fd in self.fds:
+            close(fd)
+        self.fds = []
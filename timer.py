@@ -3,9 +3,10 @@ import time
 from common import echo
 
 
-def print_time(i, L, t_start):
+def print_time(i, L, t_start, t_rem=None):
     t_done = time.time() - t_start
-    t_rem = (t_done) * (L - i) / i
+    if t_rem is None:
+        t_rem = (t_done) * (L - i) / i
 
     if t_done > 60:
         t_done /= 60